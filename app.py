@@ -8,25 +8,85 @@ Date: November 10, 2025
 
 import sys
 import os
+import threading
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from controllers import ImageController, VideoController
-from views import ConsoleView
+# Cap native thread pools trước khi torch/paddle được import (qua controllers)
 from core import Config
+Config.setup_thread_limits()
+
+from controllers import ImageController, VideoController, PlateRecognitionController
+from views import ConsoleView
 
 
 class Application:
     """Main Application với MVC Architecture"""
-    
+
     def __init__(self):
         """Khởi tạo ứng dụng"""
         self.view = ConsoleView()
         self.config = Config()
-        
+
+        # Controllers được cache để YOLO + OCR chỉ load 1 lần mỗi process
+        self._recognition_controller = None
+        self._image_controller = None
+        self._video_controller = None
+
         # Create necessary directories
         Config.create_directories()
+
+        # Preload model trong background: YOLO+OCR load trong lúc user đọc
+        # menu, nên lựa chọn đầu tiên không phải chờ cold-load
+        self._loader_thread = threading.Thread(
+            target=self._preload_controllers, daemon=True
+        )
+        self._loader_thread.start()
+
+    def _preload_controllers(self):
+        """Load trước PlateRecognitionController (chạy trong background thread)"""
+        try:
+            self._recognition_controller = PlateRecognitionController(
+                model_path=Config.YOLO_MODEL_PATH,
+                use_ocr=True,
+                use_gpu=Config.USE_GPU
+            )
+        except Exception as e:
+            print(f"⚠️ Preload error: {e}")
+
+    def _get_recognition_controller(self) -> PlateRecognitionController:
+        """Lấy PlateRecognitionController dùng chung (load model 1 lần)"""
+        # Đợi preload thread xong (no-op nếu đã xong)
+        if self._loader_thread is not None:
+            self._loader_thread.join()
+            self._loader_thread = None
+
+        if self._recognition_controller is None:
+            self._recognition_controller = PlateRecognitionController(
+                model_path=Config.YOLO_MODEL_PATH,
+                use_ocr=True,
+                use_gpu=Config.USE_GPU
+            )
+        return self._recognition_controller
+
+    def _get_image_controller(self) -> ImageController:
+        """Lấy ImageController đã cache"""
+        if self._image_controller is None:
+            self._image_controller = ImageController(
+                Config.YOLO_MODEL_PATH,
+                controller=self._get_recognition_controller()
+            )
+        return self._image_controller
+
+    def _get_video_controller(self) -> VideoController:
+        """Lấy VideoController đã cache"""
+        if self._video_controller is None:
+            self._video_controller = VideoController(
+                Config.YOLO_MODEL_PATH,
+                controller=self._get_recognition_controller()
+            )
+        return self._video_controller
     
     def run(self):
         """Chạy ứng dụng"""
@@ -80,7 +140,7 @@ class Application:
             return
         
         self.view.show_info("Đang khởi tạo controller...")
-        controller = ImageController(Config.YOLO_MODEL_PATH)
+        controller = self._get_image_controller()
         
         self.view.show_info("Đang xử lý ảnh...")
         results = controller.detect_single_image(
@@ -104,7 +164,7 @@ class Application:
             return
         
         self.view.show_info("Đang khởi tạo controller...")
-        controller = ImageController(Config.YOLO_MODEL_PATH)
+        controller = self._get_image_controller()
         
         self.view.show_info("Đang xử lý folder...")
         stats = controller.detect_folder(
@@ -142,7 +202,7 @@ class Application:
             )
         
         self.view.show_info("Đang khởi tạo controller...")
-        controller = VideoController(Config.YOLO_MODEL_PATH)
+        controller = self._get_video_controller()
         
         self.view.show_info("Đang xử lý video (nhấn 'q' để dừng)...")
         stats = controller.process_video(
@@ -164,7 +224,7 @@ class Application:
         camera_id = int(camera_id) if camera_id else 0
         
         self.view.show_info("Đang khởi tạo controller...")
-        controller = VideoController(Config.YOLO_MODEL_PATH)
+        controller = self._get_video_controller()
         
         self.view.show_info("Đang mở webcam (nhấn 'q' để dừng)...")
         controller.process_webcam(
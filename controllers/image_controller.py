@@ -7,6 +7,7 @@ import cv2
 import numpy as np
 from typing import Dict, List
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from .plate_recognition_controller import PlateRecognitionController
 
@@ -14,14 +15,17 @@ from .plate_recognition_controller import PlateRecognitionController
 class ImageController:
     """Controller cho xử lý ảnh"""
     
-    def __init__(self, model_path: str = 'weights/best.pt'):
+    def __init__(self,
+                 model_path: str = 'weights/best.pt',
+                 controller: PlateRecognitionController | None = None):
         """
         Khởi tạo controller
-        
+
         Args:
             model_path: Đường dẫn model
+            controller: PlateRecognitionController có sẵn (share model đã load)
         """
-        self.controller = PlateRecognitionController(
+        self.controller = controller or PlateRecognitionController(
             model_path=model_path,
             use_ocr=True,
             use_gpu=False
@@ -43,18 +47,14 @@ class ImageController:
             conf=conf,
             preprocess=True
         )
-        
-        # Format results for GUI
-        formatted_results = []
+
+        # Alias key GUI-friendly ngay trên dict có sẵn thay vì build dict mới
+        # cho từng plate
         for r in results:
-            formatted_results.append({
-                'text': r.get('plate_text', 'N/A'),
-                'confidence': r.get('ocr_confidence', 0.0),
-                'bbox': r.get('bbox', [0, 0, 0, 0]),
-                'detection_confidence': r.get('detection_confidence', 0.0)
-            })
-        
-        return formatted_results
+            r['text'] = r.pop('plate_text', 'N/A')
+            r['confidence'] = r.pop('ocr_confidence', 0.0)
+
+        return results
     
     def detect_single_image(self, 
                            image_path: str,
@@ -76,19 +76,21 @@ class ImageController:
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image not found: {image_path}")
         
-        # Process
-        results = self.controller.process_image(
+        # Process (nhận lại luôn ảnh đã decode để khỏi imread lần 2 khi lưu)
+        results, source_image = self.controller.process_image(
             image_path,
             conf=conf,
-            preprocess=True
+            preprocess=True,
+            return_image=True
         )
-        
+
         print(f"\n✅ Detected {len(results)} plate(s)")
-        
+
         # Save if needed
         if save_result and results:
-            self._save_results(image_path, results, output_dir)
-        
+            image_name = os.path.splitext(os.path.basename(image_path))[0]
+            self._save_results(source_image, image_name, results, output_dir)
+
         return results
     
     def detect_folder(self,
@@ -121,46 +123,47 @@ class ImageController:
         
         return stats
     
-    def _save_results(self, 
-                     image_path: str,
+    def _save_results(self,
+                     source_image: np.ndarray,
+                     image_name: str,
                      results: List[Dict],
                      output_dir: str):
-        """Lưu kết quả"""
+        """Lưu kết quả (nhận ảnh đã decode sẵn, không imread lại)"""
         os.makedirs(output_dir, exist_ok=True)
-        
-        # Read original image
-        image = cv2.imread(image_path)
-        if image is None:
-            return
-        
-        result_image = image.copy()
-        image_name = os.path.splitext(os.path.basename(image_path))[0]
-        
-        # Draw results
-        for idx, result in enumerate(results, 1):
+
+        # Copy full-frame chỉ khi thật sự có detection để vẽ
+        # (tránh memcpy O(W·H) vô ích với results rỗng)
+        result_image = None
+
+        # Pass 1: draw (thuần memory ops, không chặn bởi disk I/O)
+        for result in results:
+            if result_image is None:
+                result_image = source_image.copy()
             x1, y1, x2, y2 = result['bbox']
             text = result['plate_text']
             det_conf = result['detection_confidence']
             ocr_conf = result['ocr_confidence']
-            
+
             # Draw box
             cv2.rectangle(result_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
+
             # Draw text
             label = f"{text}"
             conf_label = f"Det:{det_conf:.2f} OCR:{ocr_conf:.2f}"
-            
+
             cv2.putText(result_image, label, (x1, y1-25),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
             cv2.putText(result_image, conf_label, (x1, y1-5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-            
-            # Save plate crop
-            plate_path = os.path.join(output_dir, f"{image_name}_plate_{idx}.jpg")
-            cv2.imwrite(plate_path, result['plate_image'])
-        
-        # Save result image
-        result_path = os.path.join(output_dir, f"{image_name}_result.jpg")
-        cv2.imwrite(result_path, result_image)
-        
+
+        # Pass 2: ghi file song song (JPEG encode release GIL nên overlap được)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for idx, result in enumerate(results, 1):
+                plate_path = os.path.join(output_dir, f"{image_name}_plate_{idx}.jpg")
+                executor.submit(cv2.imwrite, plate_path, result['plate_image'])
+
+            if result_image is not None:
+                result_path = os.path.join(output_dir, f"{image_name}_result.jpg")
+                executor.submit(cv2.imwrite, result_path, result_image)
+
         print(f"✅ Results saved to: {output_dir}")
@@ -7,6 +7,8 @@ import cv2
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from models import PlateDetectorModel, OCRModel, ImageProcessorModel
@@ -15,44 +17,80 @@ from models import PlateDetectorModel, OCRModel, ImageProcessorModel
 class PlateRecognitionController:
     """Controller chính cho hệ thống nhận diện biển số"""
     
-    def __init__(self, 
+    def __init__(self,
                  model_path: str = 'weights/best.pt',
                  use_ocr: bool = True,
-                 use_gpu: bool = False):
+                 use_gpu: bool = False,
+                 warmup: bool = True):
         """
         Khởi tạo controller
-        
+
         Args:
             model_path: Đường dẫn YOLO model
             use_ocr: Sử dụng OCR
             use_gpu: Sử dụng GPU
+            warmup: Chạy warm-up inference để giảm độ trễ frame đầu tiên
         """
         # Initialize models
         self.detector = PlateDetectorModel(model_path)
         self.image_processor = ImageProcessorModel()
-        
+
+        # OCR được khởi tạo lazy: PaddleOCR load model nặng, chỉ trả chi phí
+        # khi thực sự có plate cần nhận dạng (xem property `ocr`)
         self.use_ocr = use_ocr
-        if use_ocr:
-            self.ocr = OCRModel(lang='en', use_gpu=use_gpu)
-        else:
-            self.ocr = None
-        
+        self._use_gpu = use_gpu
+        self._ocr = None
+
+        # Thread pool dùng lại cho OCR song song (PaddleOCR chạy native code,
+        # release GIL nên threads overlap được trên nhiều core)
+        self._ocr_executor = ThreadPoolExecutor(max_workers=4)
+
+        # LRU cache kết quả OCR: cùng plate xuất hiện qua nhiều frame thì
+        # chỉ OCR 1 lần (key = bbox lượng tử hoá + hash ảnh crop)
+        self._ocr_cache: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        self._ocr_cache_max = 256
+
+        if warmup:
+            self._warmup()
+
         print(f"✅ PlateRecognitionController initialized")
+
+    @property
+    def ocr(self) -> Optional[OCRModel]:
+        """OCRModel khởi tạo lazy ở lần truy cập đầu tiên (cache lại sau đó)"""
+        if self.use_ocr and self._ocr is None:
+            self._ocr = OCRModel(lang='en', use_gpu=self._use_gpu)
+        return self._ocr
+
+    def _warmup(self):
+        """
+        Chạy dummy inference để trả trước chi phí JIT/autotune lúc khởi động,
+        tránh frame thật đầu tiên bị chậm
+        """
+        try:
+            self.detector.detect(np.zeros((640, 640, 3), dtype=np.uint8), conf=0.25)
+            # Chỉ warm OCR nếu đã được khởi tạo (không phá vỡ lazy-load)
+            if self._ocr is not None and self._ocr.available:
+                self._ocr.recognize_multiple_attempts(np.zeros((64, 192, 3), dtype=np.uint8))
+        except Exception as e:
+            print(f"⚠️ Warmup error (ignored): {e}")
     
     def process_image(self, 
                      image: np.ndarray | str,
                      conf: float = 0.25,
                      preprocess: bool = True,
-                     fast_mode: bool = True) -> List[Dict]:
+                     fast_mode: bool = True,
+                     return_image: bool = False) -> List[Dict] | Tuple[List[Dict], np.ndarray]:
         """
         Xử lý ảnh: phát hiện và nhận dạng biển số
-        
+
         Args:
             image: Ảnh numpy array hoặc đường dẫn file
             conf: Confidence threshold
             preprocess: Tiền xử lý ảnh
             fast_mode: Chế độ nhanh
-            
+            return_image: Trả kèm ảnh đã decode (tránh caller phải imread lại)
+
         Returns:
             List of results:
             {
@@ -62,14 +100,25 @@ class PlateRecognitionController:
                 'ocr_confidence': float,
                 'plate_image': np.ndarray
             }
+            Nếu return_image=True: (results, image)
         """
         # Load image if path
         if isinstance(image, str):
             image = cv2.imread(image)
             if image is None:
                 raise ValueError(f"Cannot read image: {image}")
-        
+
+        # Downscale ảnh lớn (ảnh 4K/8MP) trước preprocessing + YOLO: chi phí
+        # giảm theo scale^2. Giữ bản gốc để crop plate full-res cho OCR
+        original = image
+        h, w = image.shape[:2]
+        scale = min(1.0, 1280 / max(h, w))
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale,
+                              interpolation=cv2.INTER_AREA)
+
         # Preprocess if needed
+        rotation_angle = 0.0
         if preprocess:
             image, debug_info = self.image_processor.preprocess(
                 image,
@@ -79,32 +128,154 @@ class PlateRecognitionController:
                 sharpen_img=True,
                 fast_mode=fast_mode
             )
-        
+            rotation_angle = debug_info.get('rotation_angle', 0.0)
+
         # Detect plates
         detections = self.detector.detect(image, conf)
-        
+
+        # Map bbox về toạ độ gốc và crop lại từ ảnh full-res (OCR nét hơn).
+        # Deskew xoay quanh tâm nên bất biến theo scale: nếu bản downscale đã
+        # bị xoay thì áp cùng góc lên bản full-res trước khi crop, không thì
+        # bbox (hệ toạ độ đã xoay) sẽ lệch khỏi biển số trên ảnh chưa xoay
+        if scale < 1.0:
+            crop_src = original
+            if rotation_angle:
+                M = cv2.getRotationMatrix2D((w // 2, h // 2), rotation_angle, 1.0)
+                crop_src = cv2.warpAffine(original, M, (w, h),
+                                          flags=cv2.INTER_CUBIC,
+                                          borderMode=cv2.BORDER_REPLICATE)
+            for detection in detections:
+                x1, y1, x2, y2 = detection['bbox']
+                x1 = max(0, int(x1 / scale))
+                y1 = max(0, int(y1 / scale))
+                x2 = min(w, int(x2 / scale))
+                y2 = min(h, int(y2 / scale))
+                detection['bbox'] = (x1, y1, x2, y2)
+                detection['plate_image'] = crop_src[y1:y2, x1:x2].copy()
+
+        results = self._recognize_detections(detections)
+
+        if return_image:
+            # Trả ảnh decode gốc (không filter) để caller vẽ kết quả lên đó;
+            # case downscale trả bản crop_src cho khớp hệ toạ độ bbox (bằng
+            # chính ảnh gốc trừ khi deskew đã xoay)
+            if scale < 1.0:
+                return results, crop_src
+            return results, original
+
+        return results
+
+    def process_frame(self, frame: np.ndarray, conf: float = 0.25) -> List[Dict]:
+        """
+        Đường xử lý chuyên biệt cho video/webcam: frame luôn là ndarray,
+        không preprocess — bỏ hết type-check và branch của process_image
+        trong hot loop
+
+        Args:
+            frame: Frame BGR (numpy array)
+            conf: Confidence threshold
+
+        Returns:
+            List of results (cùng format với process_image)
+        """
+        detections = self.detector.detect(frame, conf)
+        return self._recognize_detections(detections)
+
+    @staticmethod
+    def _ocr_cache_key(bbox: Tuple[int, int, int, int],
+                       plate_img: np.ndarray) -> Optional[tuple]:
+        """
+        Tạo cache key cho 1 plate: bbox lượng tử hoá 16px + average-hash 8x8
+        của crop (~µs, rẻ hơn OCR vài bậc độ lớn)
+
+        Returns:
+            Key tuple, hoặc None nếu crop không hợp lệ (không cache)
+        """
+        if plate_img is None or plate_img.size == 0:
+            return None
+
+        x1, y1, x2, y2 = bbox
+
+        small = cv2.resize(plate_img, (8, 8), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        bits = (small > small.mean()).tobytes()
+
+        return (x1 // 16, y1 // 16, x2 // 16, y2 // 16, bits)
+
+    def _recognize_detections(self, detections: List[Dict]) -> List[Dict]:
+        """
+        Chạy OCR trên các detection và build kết quả
+
+        Args:
+            detections: List detections từ detector
+
+        Returns:
+            List of results (cùng format với process_image)
+        """
+        if not detections:
+            return []
+
+        # Truy cập self.ocr ở đây mới trigger lazy-load (chỉ khi có plate)
+        ocr_enabled = self.use_ocr and self.ocr and self.ocr.available
+
+        ocr_results: List[Optional[Tuple[str, float]]] = [None] * len(detections)
+        cache_keys: List[Optional[tuple]] = [None] * len(detections)
+        pending = []
+
+        if ocr_enabled:
+            # Cache hit: cùng 1 xe đứng yên qua nhiều frame thì crop gần như
+            # y hệt — không cần OCR lại
+            for i, detection in enumerate(detections):
+                key = self._ocr_cache_key(detection['bbox'], detection['plate_image'])
+                cache_keys[i] = key
+
+                if key is not None and key in self._ocr_cache:
+                    self._ocr_cache.move_to_end(key)
+                    ocr_results[i] = self._ocr_cache[key]
+                else:
+                    pending.append(i)
+
+            # OCR các crop chưa có trong cache (song song khi có nhiều plate)
+            if len(pending) > 1:
+                futures = {
+                    i: self._ocr_executor.submit(
+                        self.ocr.recognize_multiple_attempts,
+                        detections[i]['plate_image']
+                    )
+                    for i in pending
+                }
+                for i, future in futures.items():
+                    ocr_results[i] = future.result()
+            elif pending:
+                i = pending[0]
+                ocr_results[i] = self.ocr.recognize_multiple_attempts(
+                    detections[i]['plate_image']
+                )
+
+            # Cập nhật cache (LRU, cap kích thước)
+            for i in pending:
+                key = cache_keys[i]
+                if key is not None:
+                    self._ocr_cache[key] = ocr_results[i]
+                    while len(self._ocr_cache) > self._ocr_cache_max:
+                        self._ocr_cache.popitem(last=False)
+        else:
+            ocr_results = [("", 0.0)] * len(detections)
+
         results = []
-        
-        # Process each plate
-        for detection in detections:
-            plate_img = detection['plate_image']
-            
-            # OCR if enabled
-            if self.use_ocr and self.ocr and self.ocr.available:
-                text, ocr_conf = self.ocr.recognize_multiple_attempts(plate_img)
-            else:
-                text, ocr_conf = "", 0.0
-            
+
+        for detection, (text, ocr_conf) in zip(detections, ocr_results):
             result = {
                 'bbox': detection['bbox'],
                 'detection_confidence': detection['confidence'],
                 'plate_text': text,
                 'ocr_confidence': ocr_conf,
-                'plate_image': plate_img
+                'plate_image': detection['plate_image']
             }
-            
+
             results.append(result)
-        
+
         return results
     
     def process_folder(self,
@@ -112,53 +283,86 @@ class PlateRecognitionController:
                       conf: float = 0.25,
                       output_dir: str | None = None,
                       max_images: int | None = None,
-                      preprocess: bool = True) -> Dict:
+                      preprocess: bool = True,
+                      batch_size: int = 8) -> Dict:
         """
         Xử lý tất cả ảnh trong folder
-        
+
         Args:
             folder_path: Đường dẫn folder
             conf: Confidence threshold
             output_dir: Thư mục output (None = không lưu)
             max_images: Số ảnh tối đa
             preprocess: Tiền xử lý
-            
+            batch_size: Số ảnh đưa vào YOLO mỗi lần predict
+
         Returns:
             Statistics dict
         """
-        # Get images
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-        image_files = []
-        
-        for ext in image_extensions:
-            image_files.extend(Path(folder_path).glob(f'*{ext}'))
-            image_files.extend(Path(folder_path).glob(f'*{ext.upper()}'))
-        
+        # Get images: 1 lần scandir + set lookup thay vì 8 lượt glob
+        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
+        image_files = sorted(
+            (Path(entry.path) for entry in os.scandir(folder_path)
+             if entry.is_file()
+             and os.path.splitext(entry.name)[1].lower() in image_extensions),
+            key=lambda p: p.name
+        )
+
         if max_images:
             image_files = image_files[:max_images]
-        
+
         print(f"\n📁 Processing {len(image_files)} images\n")
-        
+
         all_results = []
         total_plates = 0
-        
-        for idx, img_path in enumerate(image_files, 1):
-            print(f"[{idx}/{len(image_files)}] {img_path.name}")
-            
+
+        # Batch YOLO inference: gom nhiều ảnh vào 1 lần predict để giảm
+        # overhead mỗi lần gọi model và tận dụng batching của Ultralytics
+        for batch_start in range(0, len(image_files), batch_size):
+            batch_files = image_files[batch_start:batch_start + batch_size]
+
+            batch_images = []
+            loaded_files = []
+
+            for img_path in batch_files:
+                image = cv2.imread(str(img_path))
+                if image is None:
+                    print(f"  ❌ Error: Cannot read image: {img_path}")
+                    continue
+
+                if preprocess:
+                    image, _ = self.image_processor.preprocess(
+                        image,
+                        deskew=True,
+                        enhance=True,
+                        denoise_img=True,
+                        sharpen_img=True,
+                        fast_mode=True
+                    )
+
+                batch_images.append(image)
+                loaded_files.append(img_path)
+
             try:
-                results = self.process_image(str(img_path), conf, preprocess)
+                batch_detections = self.detector.detect_batch(batch_images, conf)
+            except Exception as e:
+                print(f"  ❌ Error: {e}")
+                continue
+
+            for offset, (img_path, detections) in enumerate(zip(loaded_files, batch_detections)):
+                idx = batch_start + offset + 1
+                print(f"[{idx}/{len(image_files)}] {img_path.name}")
+
+                results = self._recognize_detections(detections)
                 all_results.extend(results)
                 total_plates += len(results)
-                
+
                 # Print results
                 for i, result in enumerate(results, 1):
                     text = result['plate_text']
                     det_conf = result['detection_confidence']
                     ocr_conf = result['ocr_confidence']
                     print(f"  Plate {i}: '{text}' | Det: {det_conf:.2f} | OCR: {ocr_conf:.2f}")
-                
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
         
         stats = {
             'total_images': len(image_files),
@@ -181,6 +385,6 @@ class PlateRecognitionController:
         """
         return {
             'detector': self.detector.get_model_info(),
-            'ocr': self.ocr.get_model_info() if self.ocr else None,
+            'ocr': self._ocr.get_model_info() if self._ocr else None,
             'use_ocr': self.use_ocr
         }
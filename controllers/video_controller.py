@@ -7,6 +7,9 @@ import cv2
 import numpy as np
 from typing import Dict
 import os
+import queue
+import threading
+from collections import Counter
 
 from .plate_recognition_controller import PlateRecognitionController
 
@@ -14,18 +17,68 @@ from .plate_recognition_controller import PlateRecognitionController
 class VideoController:
     """Controller cho xử lý video và webcam"""
     
-    def __init__(self, model_path: str = 'weights/best.pt'):
+    def __init__(self,
+                 model_path: str = 'weights/best.pt',
+                 controller: PlateRecognitionController | None = None):
         """
         Khởi tạo controller
-        
+
         Args:
             model_path: Đường dẫn model
+            controller: PlateRecognitionController có sẵn (share model đã load)
         """
-        self.controller = PlateRecognitionController(
+        self.controller = controller or PlateRecognitionController(
             model_path=model_path,
             use_ocr=True,
             use_gpu=False
         )
+
+        # Inter-frame change detection: bỏ qua inference trên frame tĩnh
+        self._prev_small = None
+        self._last_results = []
+
+        # Cache label string theo (text, conf) — cùng plate qua nhiều frame
+        # không phải format lại chuỗi
+        self._label_cache: Dict[tuple, str] = {}
+
+    def _get_label(self, text: str, ocr_conf: float) -> str:
+        """Lấy label đã format, cache theo (text, conf làm tròn 2 chữ số)"""
+        key = (text, round(ocr_conf, 2))
+        label = self._label_cache.get(key)
+
+        if label is None:
+            label = f"{text} ({ocr_conf:.2f})"
+            if len(self._label_cache) > 512:
+                self._label_cache.clear()
+            self._label_cache[key] = label
+
+        return label
+
+    def _frame_changed(self, frame: np.ndarray, threshold: float = 4.0) -> bool:
+        """
+        Kiểm tra frame có thay đổi đáng kể so với frame đã xử lý trước đó không
+        (so sánh absdiff trên bản thu nhỏ 32x32 — rẻ hơn inference hàng nghìn lần)
+
+        Args:
+            frame: Frame hiện tại
+            threshold: Ngưỡng mean absdiff per-pixel
+
+        Returns:
+            True nếu frame thay đổi (cần chạy inference lại)
+        """
+        small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+
+        if self._prev_small is None:
+            self._prev_small = small
+            return True
+
+        diff = cv2.absdiff(self._prev_small, small).mean()
+
+        if diff < threshold:
+            return False
+
+        self._prev_small = small
+        return True
     
     def process_video(self,
                      video_path: str,
@@ -46,10 +99,22 @@ class VideoController:
         Returns:
             Statistics
         """
-        cap = cv2.VideoCapture(video_path)
-        
+        # Backend FFMPEG + hardware decode (nếu có) để giải phóng CPU cho inference
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(video_path)
+
         if not cap.isOpened():
             raise ValueError(f"Cannot open video: {video_path}")
+
+        try:
+            cap.set(cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY)
+        except AttributeError:
+            pass  # OpenCV < 4.5.2 không có HW acceleration API
+
+        # Reset state change-detection cho video mới
+        self._prev_small = None
+        self._last_results = []
         
         # Get properties
         fps = int(cap.get(cv2.CAP_PROP_FPS))
@@ -65,76 +130,136 @@ class VideoController:
         
         frame_count = 0
         processed_count = 0
-        detected_texts = set()
-        
+        # Counter thay vì set: lọc nhiễu OCR 1-frame bằng min-count và
+        # prune định kỳ để không phình bộ nhớ trên video dài
+        detected_texts = Counter()
+        min_count = 3
+        max_tracked_texts = 10_000
+
         print(f"\n🎥 Processing video: {video_path}")
         print(f"   Resolution: {width}x{height} @ {fps}fps\n")
-        
-        try:
-            while True:
+
+        # Pipeline: capture thread -> inference (main thread) -> writer thread.
+        # Decode/encode là I/O-bound còn inference là compute-bound nên chạy
+        # song song qua queue (bounded để giới hạn memory)
+        frames_q: queue.Queue = queue.Queue(maxsize=8)
+        out_q: queue.Queue = queue.Queue(maxsize=8)
+        stop_event = threading.Event()
+
+        def capture_worker():
+            while not stop_event.is_set():
                 ret, frame = cap.read()
                 if not ret:
                     break
-                
+                frames_q.put(frame)
+            frames_q.put(None)  # Sentinel EOS
+
+        def writer_worker():
+            # Khi show=False, loop này thuần encode — không imshow/waitKey,
+            # không ép sleep 1ms mỗi frame
+            shown_count = 0
+            while True:
+                item = out_q.get()
+                if item is None:
+                    break
+                frame = item
+
+                if out:
+                    out.write(frame)
+
+                if show:
+                    cv2.imshow('Video Processing', frame)
+                    shown_count += 1
+                    # waitKey ép yield >=1ms mỗi lần gọi — poll phím mỗi 2 frame
+                    # là đủ responsive và giảm nửa overhead GUI
+                    if shown_count % 2 == 0:
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            stop_event.set()
+
+        capture_thread = threading.Thread(target=capture_worker, daemon=True)
+        writer_thread = threading.Thread(target=writer_worker, daemon=True)
+        capture_thread.start()
+        writer_thread.start()
+
+        try:
+            while not stop_event.is_set():
+                frame = frames_q.get()
+                if frame is None:
+                    break
+
                 frame_count += 1
-                
+
                 # Process every N frames
                 if frame_count % process_every_n_frames == 0:
-                    results = self.controller.process_image(
-                        frame,
-                        conf=conf,
-                        preprocess=False,  # Skip preprocessing for speed
-                        fast_mode=True
-                    )
-                    
+                    # Frame tĩnh (xe đỗ, cảnh không đổi): reuse kết quả cũ
+                    if self._frame_changed(frame):
+                        results = self.controller.process_frame(frame, conf)
+                        self._last_results = results
+                    else:
+                        results = self._last_results
+
                     # Draw results
                     for result in results:
                         x1, y1, x2, y2 = result['bbox']
                         text = result['plate_text']
                         ocr_conf = result['ocr_confidence']
-                        
-                        if text:
-                            detected_texts.add(text)
-                        
+
                         cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        label = f"{text} ({ocr_conf:.2f})"
+
+                        # Không vẽ label "(0.00)" lên box chưa đọc được text
+                        if not text:
+                            continue
+
+                        detected_texts[text] += 1
+                        label = self._get_label(text, ocr_conf)
                         cv2.putText(frame, label, (x1, y1-10),
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    
+
                     processed_count += 1
-                
-                # Write frame
-                if out:
-                    out.write(frame)
-                
-                # Show
-                if show:
-                    cv2.imshow('Video Processing', frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
-                
+
+                out_q.put(frame)
+
                 # Progress
                 if frame_count % (fps * 5) == 0:
                     print(f"   Processed {frame_count} frames...")
-        
+
+                    # Prune text chỉ xuất hiện 1 lần khi tracker quá lớn
+                    if len(detected_texts) > max_tracked_texts:
+                        detected_texts = Counter(
+                            {t: c for t, c in detected_texts.items() if c > 1}
+                        )
+
         finally:
+            stop_event.set()
+            # Drain để capture thread không bị kẹt trên put() khi queue đầy
+            while not frames_q.empty():
+                try:
+                    frames_q.get_nowait()
+                except queue.Empty:
+                    break
+            out_q.put(None)  # Sentinel EOS cho writer
+            writer_thread.join(timeout=5)
+            capture_thread.join(timeout=5)
             cap.release()
             if out:
                 out.release()
             cv2.destroyAllWindows()
         
+        # Chỉ báo các plate xuất hiện đủ min_count frame (lọc nhiễu OCR)
+        confirmed_plates = [t for t, c in detected_texts.items() if c >= min_count]
+
         stats = {
             'total_frames': frame_count,
             'processed_frames': processed_count,
-            'unique_plates': len(detected_texts),
-            'plates': list(detected_texts)
+            'unique_plates': len(confirmed_plates),
+            'plates': confirmed_plates
         }
-        
+
         print(f"\n✅ Video processed!")
         print(f"   Total frames: {frame_count}")
-        print(f"   Unique plates: {len(detected_texts)}")
-        if detected_texts:
-            print(f"   Plates: {', '.join(detected_texts)}")
+        print(f"   Unique plates: {len(confirmed_plates)}")
+        if confirmed_plates:
+            print(f"   Plates: {', '.join(confirmed_plates)}")
         
         return stats
     
@@ -146,10 +271,17 @@ class VideoController:
             conf: Confidence threshold
             camera_id: Camera ID
         """
-        cap = cv2.VideoCapture(camera_id)
-        
+        cap = cv2.VideoCapture(camera_id, cv2.CAP_ANY)
+
         if not cap.isOpened():
             raise RuntimeError("Cannot open camera")
+
+        # Buffer 1 frame: luôn xử lý frame mới nhất thay vì frame cũ trong buffer
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Reset state change-detection cho phiên webcam mới
+        self._prev_small = None
+        self._last_results = []
         
         window_name = 'Webcam - License Plate Detection'
         print("\n📹 Webcam opened. Press 'q' to quit\n")
@@ -160,13 +292,12 @@ class VideoController:
                 if not ret:
                     break
                 
-                # Process
-                results = self.controller.process_image(
-                    frame,
-                    conf=conf,
-                    preprocess=False,
-                    fast_mode=True
-                )
+                # Process (bỏ qua inference khi frame không đổi)
+                if self._frame_changed(frame):
+                    results = self.controller.process_frame(frame, conf)
+                    self._last_results = results
+                else:
+                    results = self._last_results
                 
                 # Draw results
                 for result in results:
@@ -175,9 +306,9 @@ class VideoController:
                     ocr_conf = result['ocr_confidence']
                     
                     cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    
+
                     if text:
-                        label = f"{text} ({ocr_conf:.2f})"
+                        label = self._get_label(text, ocr_conf)
                         cv2.putText(frame, label, (x1, y1-10),
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 
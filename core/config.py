@@ -4,6 +4,7 @@ Cấu hình chung cho toàn bộ ứng dụng
 """
 
 import os
+import re
 
 
 class Config:
@@ -34,7 +35,16 @@ class Config:
     
     # Vietnamese plate format
     PLATE_FORMAT_REGEX = r'^\d{2}[A-Z]-\d{3,5}\.?\d{0,2}$'
+    # Compiled 1 lần lúc import — dùng Config.PLATE_FORMAT_RE.match(text)
+    # thay vì re.match(PLATE_FORMAT_REGEX, ...) để khỏi re-parse pattern
+    PLATE_FORMAT_RE = re.compile(PLATE_FORMAT_REGEX)
     
+    # Thread limits: OpenCV (TBB), torch và PaddlePaddle (MKL) đều mặc định
+    # chiếm hết core — chạy đồng thời sẽ oversubscribe. Giới hạn mỗi pool
+    # còn 1 nửa số core
+    CPU_THREADS_CV = max(1, (os.cpu_count() or 2) // 2)
+    CPU_THREADS_TORCH = max(1, (os.cpu_count() or 2) // 2)
+
     # Logging
     VERBOSE = True
     LOG_FILE = 'app.log'
@@ -57,6 +67,27 @@ class Config:
             'output_dir': cls.OUTPUT_DIR
         }
     
+    @classmethod
+    def setup_thread_limits(cls):
+        """
+        Giới hạn thread count của các native library. Gọi càng sớm càng tốt
+        (env vars phải set trước khi paddle/torch được import)
+        """
+        os.environ.setdefault('OMP_NUM_THREADS', str(cls.CPU_THREADS_TORCH))
+        os.environ.setdefault('MKL_NUM_THREADS', str(cls.CPU_THREADS_TORCH))
+
+        try:
+            import cv2
+            cv2.setNumThreads(cls.CPU_THREADS_CV)
+        except ImportError:
+            pass
+
+        try:
+            import torch
+            torch.set_num_threads(cls.CPU_THREADS_TORCH)
+        except ImportError:
+            pass
+
     @classmethod
     def create_directories(cls):
         """Tạo các thư mục cần thiết"""
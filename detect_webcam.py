@@ -6,20 +6,43 @@ Updated: November 7, 2025 - Added PaddleOCR support
 
 from ultralytics import YOLO
 import cv2
+import numpy as np
+import threading
+import time
 from utils import create_ocr_processor
 
 class WebcamLicensePlateDetector:
-    def __init__(self, model_path='models/best.pt', enable_ocr=True):
+    def __init__(self, model_path='models/best.pt', enable_ocr=True, batch_size=1,
+                 infer_size=640):
         """
         Khởi tạo detector
-        
+
         Args:
             model_path: Đường dẫn đến file model (.pt)
             enable_ocr: Bật OCR (PaddleOCR)
+            batch_size: Số frame gom lại cho 1 lần predict (>1 tăng throughput,
+                        đổi lấy vài frame độ trễ)
+            infer_size: imgsz cho YOLO predict (model train ở 640; frame to hơn
+                        chỉ tốn FLOPs ~bình phương theo cạnh)
         """
         self.model = YOLO(model_path)
+        self.batch_size = max(1, batch_size)
+        self.infer_size = infer_size
+        # Buffer annotate tái dùng giữa các frame (np.copyto thay frame.copy())
+        self._annot_buf = None
+
+        # Ring buffer 8 detection gần nhất cho temporal smoothing: biển số
+        # không đổi giữa các frame liền kề nên box trùng (IoU cao) với entry
+        # confidence cao mới đây thì lấy lại text, khỏi chạy OCR.
+        # Lưu dạng mảng numpy cố định để tính IoU vectorized 1 phát
+        self._recent_boxes = np.zeros((8, 4), dtype=np.float32)
+        self._recent_conf = np.zeros(8, dtype=np.float32)
+        self._recent_frame = np.full(8, -1_000_000, dtype=np.int64)
+        self._recent_text = [""] * 8
+        self._recent_head = 0
+
         print(f"✅ Model loaded: {model_path}")
-        
+
         self.enable_ocr = enable_ocr
         if enable_ocr:
             try:
@@ -38,89 +61,215 @@ class WebcamLicensePlateDetector:
                 self.ocr_processor = None
         else:
             self.ocr_processor = None
-    
-    def detect_webcam(self, conf=0.25, camera_id=0):
+
+    def _lookup_recent(self, bbox, frame_idx, iou_thresh=0.6,
+                       conf_thresh=0.8, max_age=15):
+        """
+        Tìm text OCR cache được cho box trùng với detection gần đây
+
+        Returns:
+            (text, confidence) nếu trúng cache, None nếu phải OCR thật
+        """
+        boxes = self._recent_boxes
+        ix1 = np.maximum(boxes[:, 0], bbox[0])
+        iy1 = np.maximum(boxes[:, 1], bbox[1])
+        ix2 = np.minimum(boxes[:, 2], bbox[2])
+        iy2 = np.minimum(boxes[:, 3], bbox[3])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+
+        area_box = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        area_recent = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        union = area_box + area_recent - inter
+        iou = np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+        mask = ((iou > iou_thresh)
+                & (self._recent_conf > conf_thresh)
+                & (frame_idx - self._recent_frame < max_age))
+        if not mask.any():
+            return None
+
+        best = int(np.argmax(np.where(mask, iou, -1.0)))
+        return self._recent_text[best], float(self._recent_conf[best])
+
+    def _remember_recent(self, bbox, text, conf, frame_idx):
+        """Ghi detection vào slot kế tiếp của ring buffer"""
+        i = self._recent_head
+        self._recent_boxes[i] = bbox
+        self._recent_conf[i] = conf
+        self._recent_frame[i] = frame_idx
+        self._recent_text[i] = text
+        self._recent_head = (i + 1) % len(self._recent_text)
+
+    def _annotate_frame(self, frame, result, frame_idx=0):
+        """
+        Vẽ box + OCR text cho 1 frame từ kết quả YOLO
+
+        Args:
+            frame: Frame gốc
+            result: 1 phần tử trong list kết quả của model.predict
+            frame_idx: Số thứ tự frame (cho temporal OCR cache)
+
+        Returns:
+            Frame đã annotate
+        """
+        if self._annot_buf is None or self._annot_buf.shape != frame.shape:
+            self._annot_buf = np.empty_like(frame)
+        np.copyto(self._annot_buf, frame)
+        annotated_frame = self._annot_buf
+
+        boxes = result.boxes
+        if boxes is None:
+            return annotated_frame
+
+        for box in boxes:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            confidence = float(box.conf[0])
+
+            # Draw box
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+            # OCR if enabled (box trùng detection gần đây thì lấy text cache)
+            if self.enable_ocr and self.ocr_processor:
+                try:
+                    plate_img = frame[y1:y2, x1:x2]
+                    if plate_img.size > 0:
+                        cached = self._lookup_recent((x1, y1, x2, y2), frame_idx)
+                        if cached is not None:
+                            text, ocr_conf = cached
+                        else:
+                            text, ocr_conf = self.ocr_processor.recognize_text(
+                                plate_img,
+                                preprocess=True,
+                                return_confidence=True
+                            )
+                            if text:
+                                self._remember_recent((x1, y1, x2, y2),
+                                                      text, ocr_conf, frame_idx)
+
+                        # Draw text
+                        label = f"{text} ({ocr_conf:.2f})"
+                        cv2.putText(annotated_frame, label, (x1, y1-10),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                except Exception as e:
+                    pass
+
+        return annotated_frame
+
+    def detect_webcam(self, conf=0.25, camera_id=0, display_stride=1, show=True):
         """
         Nhận diện biển số từ webcam
-        
+
         Args:
             conf: Confidence threshold
             camera_id: ID của camera (0 = camera mặc định)
+            display_stride: Chỉ imshow mỗi K frame (imshow + GUI dispatch
+                            tốn vài ms/frame trên nhiều OS)
+            show: False để chạy headless, bỏ hẳn phần hiển thị
         """
         # Mở webcam
         cap = cv2.VideoCapture(camera_id)
-        
+
         if not cap.isOpened():
             raise RuntimeError("Cannot open camera")
-        
+
+        # Buffer driver = 1 frame để retrieve() luôn trả frame mới nhất
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Ép resolution 720p: tránh driver trả mặc định 4K vừa chậm capture
+        # vừa phí công letterbox về imgsz
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+
         window_name = 'License Plate Detection - Webcam'
         print("📹 Webcam opened. Press 'q' to quit or close the window to stop.")
 
+        # Producer thread đọc camera liên tục vào 1 slot duy nhất: frame cũ
+        # bị ghi đè thay vì xếp hàng, nên inference luôn chạy trên frame
+        # mới nhất dù model chậm hơn camera
+        self._latest = None
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+
+        def capture_loop():
+            while self._running.is_set():
+                if not cap.grab():
+                    self._running.clear()
+                    break
+                ok, f = cap.retrieve()
+                if not ok:
+                    self._running.clear()
+                    break
+                with self._lock:
+                    self._latest = f
+
+        capture_thread = threading.Thread(target=capture_loop, daemon=True)
+        capture_thread.start()
+
+        display_stride = max(1, display_stride)
+        frame_idx = 0
+
         while True:
-            # Đọc frame
-            ret, frame = cap.read()
-            
-            if not ret:
-                print("❌ Cannot read frame")
-                break
-            
-            # Predict
+            # Lấy frame mới nhất (và clear slot để không xử lý lại)
+            with self._lock:
+                frame = self._latest
+                self._latest = None
+
+            if frame is None:
+                if not self._running.is_set():
+                    print("❌ Cannot read frame")
+                    break
+                time.sleep(0.005)  # Chờ producer có frame mới
+                continue
+
+            # Gom frame thành batch (đến khi đủ batch_size hoặc hết frame chờ):
+            # 1 lần predict cho cả batch amortize overhead gọi model
+            batch = [frame]
+            while len(batch) < self.batch_size:
+                with self._lock:
+                    nxt = self._latest
+                    self._latest = None
+                if nxt is None:
+                    break
+                batch.append(nxt)
+
+            # Predict (batched)
             results = self.model.predict(
-                source=frame,
+                source=batch,
                 conf=conf,
+                imgsz=self.infer_size,
                 verbose=False
             )
-            
-            # Get detections and perform OCR
-            annotated_frame = frame.copy()
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is None:
+
+            # Get detections, perform OCR và hiển thị từng frame của batch
+            # (chỉ annotate + imshow mỗi display_stride frame: output duy
+            # nhất của vòng này là màn hình nên frame bị skip khỏi vẽ luôn)
+            displayed = False
+            for frame, result in zip(batch, results):
+                frame_idx += 1
+                if not show or frame_idx % display_stride != 0:
                     continue
-                    
-                for box in boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    confidence = float(box.conf[0])
-                    
-                    # Draw box
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    
-                    # OCR if enabled
-                    if self.enable_ocr and self.ocr_processor:
-                        try:
-                            plate_img = frame[y1:y2, x1:x2]
-                            if plate_img.size > 0:
-                                text, ocr_conf = self.ocr_processor.recognize_text(
-                                    plate_img, 
-                                    preprocess=True,
-                                    return_confidence=True
-                                )
-                                
-                                # Draw text
-                                label = f"{text} ({ocr_conf:.2f})"
-                                cv2.putText(annotated_frame, label, (x1, y1-10),
-                                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        except Exception as e:
-                            pass
-            
-            # Hiển thị
-            cv2.imshow(window_name, annotated_frame)
+                annotated_frame = self._annotate_frame(frame, result, frame_idx)
+                cv2.imshow(window_name, annotated_frame)
+                displayed = True
 
             # Nhấn 'q' để thoát
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
             # Nếu người dùng đóng cửa sổ (nhấn X), getWindowProperty sẽ trả về <1
-            try:
-                if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
-                    print("Window closed by user (X). Exiting...")
-                    break
-            except Exception:
-                # một số backend không hỗ trợ getWindowProperty, bỏ qua nếu lỗi
-                pass
+            if displayed:
+                try:
+                    if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
+                        print("Window closed by user (X). Exiting...")
+                        break
+                except Exception:
+                    # một số backend không hỗ trợ getWindowProperty, bỏ qua nếu lỗi
+                    pass
         
         # Giải phóng
+        self._running.clear()
+        capture_thread.join(timeout=2)
         cap.release()
         cv2.destroyAllWindows()
         print("✅ Webcam closed")
@@ -5,8 +5,13 @@ Model chịu trách nhiệm nhận dạng ký tự từ biển số
 
 import cv2
 import numpy as np
-from typing import Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict
+import os
 import re
+import threading
+
+from core.utils import Utils
+from .image_processor import unsharp_mask
 
 
 class OCRModel:
@@ -20,13 +25,48 @@ class OCRModel:
             lang: Ngôn ngữ ('en', 'ch', 'vi')
             use_gpu: Sử dụng GPU
         """
+        # Bảng translate precompute cho post_process: thay vòng lặp Python
+        # từng ký tự bằng str.translate chạy ở C-level
+        self._strip_ws = str.maketrans('', '', ' \n\t')
+        self._strip_sep = str.maketrans('', '', '-.')
+        self._non_alnum_re = re.compile(r'[^0-9A-Z]')
+        self._digit_trans = str.maketrans({
+            'O': '0', 'Q': '0', 'I': '1', 'L': '1',
+            'Z': '2', 'S': '5', 'B': '8'
+        })
+        self._letter_trans = str.maketrans({
+            '0': 'O', '1': 'I', '3': 'B', '5': 'S', '8': 'B'
+        })
+
+        # CLAHE tạo 1 lần dùng lại per-thread: construct mỗi lần gọi tốn
+        # alloc histogram/LUT vô ích (gọi tới 3 lần/plate ở
+        # multiple_attempts), nhưng CLAHE_Impl giữ buffer nội bộ
+        # (lut_, srcExt_) nên không share 1 instance được giữa các worker
+        # của _ocr_executor trong controller
+        self._tls = threading.local()
+
         try:
             from paddleocr import PaddleOCR
-            
+
+            # Flags tăng tốc: GPU chạy FP16, CPU bật MKLDNN + giới hạn
+            # thread (để dành core cho YOLO/capture)
+            ocr_kwargs = {'lang': lang}
+            if use_gpu:
+                ocr_kwargs.update(use_gpu=True, precision='fp16')
+            else:
+                ocr_kwargs.update(
+                    enable_mkldnn=True,
+                    cpu_threads=max(1, (os.cpu_count() or 2) // 2)
+                )
+
             # Initialize PaddleOCR with compatible parameters
             # Different versions have different parameters
-            self.ocr = PaddleOCR(lang=lang)
-            
+            try:
+                self.ocr = PaddleOCR(**ocr_kwargs)
+            except TypeError:
+                # Version không nhận flags trên -> fallback init tối thiểu
+                self.ocr = PaddleOCR(lang=lang)
+
             self.available = True
             print(f"✅ PaddleOCR initialized (lang={lang})")
             
@@ -82,32 +122,82 @@ class OCRModel:
             print(f"⚠️ OCR error: {e}")
             return "", 0.0
     
-    def recognize_multiple_attempts(self, image: np.ndarray, max_attempts: int = 3) -> Tuple[str, float]:
+    def recognize_batch(self, images: List[np.ndarray]) -> List[Tuple[str, float]]:
         """
-        Nhận dạng với nhiều lần thử
-        
+        Nhận dạng nhiều ảnh biển số trong 1 lần predict
+        (PaddleOCR nhận list ảnh và amortize scheduling qua cả batch)
+
+        Args:
+            images: List ảnh biển số đã crop
+
+        Returns:
+            List (text, confidence) cùng thứ tự với input
+        """
+        if not self.available or not images:
+            return [("", 0.0)] * len(images)
+
+        try:
+            results = self.ocr.predict(images)
+        except Exception as e:
+            print(f"⚠️ OCR batch error: {e}")
+            return [("", 0.0)] * len(images)
+
+        outputs = []
+        for result_dict in results:
+            texts = result_dict.get('rec_texts') or []
+            scores = result_dict.get('rec_scores') or []
+
+            if texts and scores:
+                combined_text = self.post_process(' '.join(texts))
+                outputs.append((combined_text, float(np.mean(scores))))
+            else:
+                outputs.append(("", 0.0))
+
+        # Phòng hờ engine trả thiếu entry
+        while len(outputs) < len(images):
+            outputs.append(("", 0.0))
+
+        return outputs
+
+    def recognize_multiple_attempts(self, image: np.ndarray, max_attempts: int = 3,
+                                    early_stop_conf: float = 0.85) -> Tuple[str, float]:
+        """
+        Nhận dạng với nhiều lần thử, dừng sớm khi kết quả đã đủ tốt
+
         Args:
             image: Ảnh biển số
             max_attempts: Số lần thử tối đa
-            
+            early_stop_conf: Confidence đủ cao để bỏ qua các lần thử sau
+
         Returns:
             (best_text, best_confidence)
         """
         if not self.available:
             return "", 0.0
-        
+
+        def _good_enough(text: str, conf: float) -> bool:
+            # Đúng format biển VN hoặc confidence rất cao thì các attempt
+            # sau (mỗi cái thêm 1 lượt PaddleOCR forward) là phí công
+            if not text:
+                return False
+            return conf >= early_stop_conf or Utils.validate_plate_format(text)
+
         results = []
-        
+
         # Attempt 1: Original
         text1, conf1 = self.recognize(image)
+        if _good_enough(text1, conf1):
+            return text1, conf1
         results.append((text1, conf1))
-        
+
         if max_attempts > 1:
             # Attempt 2: Enhanced contrast
             enhanced = self._enhance_contrast(image)
             text2, conf2 = self.recognize(enhanced)
+            if _good_enough(text2, conf2):
+                return text2, conf2
             results.append((text2, conf2))
-        
+
         if max_attempts > 2:
             # Attempt 3: Sharpened
             sharpened = self._sharpen(image)
@@ -135,105 +225,66 @@ class OCRModel:
         Returns:
             Text đã xử lý
         """
-        # Remove spaces, newlines
-        text = text.replace(" ", "").replace("\n", "").replace("\t", "")
-        text = text.upper()
-        
-        # Character corrections
-        char_map = {
-            'O': '0', 'Q': '0', 'I': '1', 'L': '1',
-            'Z': '2', 'S': '5', 'B': '8', '|': '1',
-            '/': '1', '\\': '1'
-        }
-        
-        # Smart replacement by position
-        result = ""
-        alphanumeric_count = 0
-        
-        for char in text:
-            if char in ['-', '.']:
-                result += char
-                continue
-            
-            if not char.isalnum():
-                continue
-            
-            # Position 0-1: Digits (province code)
-            if alphanumeric_count < 2:
-                if char.isalpha() and char in char_map:
-                    result += char_map[char]
-                elif char.isdigit():
-                    result += char
-                else:
-                    result += char_map.get(char, char)
-            
-            # Position 2: Letter (vehicle type)
-            elif alphanumeric_count == 2:
-                if char.isdigit():
-                    digit_to_letter = {'0': 'O', '1': 'I', '3': 'B', '5': 'S', '8': 'B'}
-                    result += digit_to_letter.get(char, char)
-                else:
-                    result += char
-            
-            # Position 3+: Digits
-            else:
-                if char.isalpha() and char in char_map:
-                    result += char_map[char]
-                elif char.isdigit():
-                    result += char
-                else:
-                    result += char_map.get(char, char)
-            
-            alphanumeric_count += 1
-        
+        # Remove whitespace + uppercase rồi lọc sạch ký tự lạ
+        # (separators '-'/'.' kiểu gì cũng bị _format_vietnamese_plate strip)
+        text = text.translate(self._strip_ws).upper()
+        text = self._non_alnum_re.sub('', text)
+
+        # Smart replacement theo vị trí, bằng 3 lượt translate C-level:
+        # vị trí 0-1 là số (mã tỉnh), vị trí 2 là chữ (loại xe), còn lại là số
+        result = (
+            text[:2].translate(self._digit_trans)
+            + text[2:3].translate(self._letter_trans)
+            + text[3:].translate(self._digit_trans)
+        )
+
         # Format: 99A-99999 or 99A-999.99
         result = self._format_vietnamese_plate(result)
-        
+
         return result
     
     def _format_vietnamese_plate(self, text: str) -> str:
-        """Format theo chuẩn biển số VN"""
-        text = text.replace("-", "").replace(".", "")
-        
+        """Format theo chuẩn biển số VN (99A-99999 / 99A-999.99)"""
+        text = text.translate(self._strip_sep)
+
         if len(text) < 3:
             return text
-        
+
         if not (text[0].isdigit() and text[1].isdigit() and text[2].isalpha()):
             return text
-        
-        province = text[:2]
-        vehicle_type = text[2]
+
+        head = text[:3]
         numbers = text[3:]
-        
-        if len(numbers) == 0:
-            return f"{province}{vehicle_type}"
-        
-        formatted = f"{province}{vehicle_type}-{numbers}"
-        
+
         if len(numbers) >= 5:
-            formatted = f"{province}{vehicle_type}-{numbers[:-2]}.{numbers[-2:]}"
-        
-        return formatted
+            return f"{head}-{numbers[:-2]}.{numbers[-2:]}"
+        return f"{head}-{numbers}" if numbers else head
     
+    def _get_clahe(self):
+        """CLAHE của thread hiện tại (tạo lazy 1 lần mỗi thread)"""
+        clahe = getattr(self._tls, 'clahe', None)
+        if clahe is None:
+            clahe = self._tls.clahe = cv2.createCLAHE(
+                clipLimit=2.0, tileGridSize=(8, 8))
+        return clahe
+
     def _enhance_contrast(self, image: np.ndarray) -> np.ndarray:
         """Tăng cường contrast"""
+        clahe = self._get_clahe()
         if len(image.shape) == 3:
             lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
             l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
             l = clahe.apply(l)
             enhanced = cv2.merge([l, a, b])
             enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
             return enhanced
         else:
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
             return clahe.apply(image)
     
     def _sharpen(self, image: np.ndarray) -> np.ndarray:
-        """Làm nét ảnh"""
+        """Làm nét ảnh (kernel fused nếu có Numba)"""
         gaussian = cv2.GaussianBlur(image, (0, 0), 2.0)
-        sharpened = cv2.addWeighted(image, 1.5, gaussian, -0.5, 0)
-        return sharpened
+        return unsharp_mask(image, gaussian)
     
     def get_model_info(self) -> Dict:
         """Lấy thông tin model"""
@@ -27,14 +27,18 @@ class PlateDetectorModel:
         self.model_path = model_path
         print(f"✅ YOLO model loaded: {model_path}")
     
-    def detect(self, image: np.ndarray, conf: float = 0.25) -> List[Dict]:
+    def detect(self, image: np.ndarray, conf: float = 0.25,
+               copy: bool = False) -> List[Dict]:
         """
         Phát hiện biển số trong ảnh
-        
+
         Args:
             image: Ảnh đầu vào (numpy array)
             conf: Confidence threshold
-            
+            copy: Copy crop ra mảng riêng. Mặc định `plate_image` là view
+                  vào `image` (zero-copy) — chỉ valid chừng nào ảnh nguồn
+                  còn sống; truyền copy=True nếu cần giữ crop lâu hơn
+
         Returns:
             List of detections, mỗi detection có:
             {
@@ -44,31 +48,75 @@ class PlateDetectorModel:
             }
         """
         results = self.model.predict(source=image, conf=conf, verbose=False)
-        
+
         detections = []
-        
+
         for result in results:
             boxes = result.boxes
             if boxes is None:
                 continue
-            
+
             for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                # 1 lần GPU->CPU sync cho cả 4 toạ độ
+                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(np.int32).tolist()
                 confidence = float(box.conf[0])
-                
-                # Crop plate image
+
+                # Crop plate image (numpy view, không memcpy)
                 plate_img = image[y1:y2, x1:x2]
-                
+                if copy:
+                    plate_img = plate_img.copy()
+
                 detection = {
                     'bbox': (x1, y1, x2, y2),
                     'confidence': confidence,
-                    'plate_image': plate_img.copy()
+                    'plate_image': plate_img
                 }
-                
+
                 detections.append(detection)
-        
+
         return detections
     
+    def detect_batch(self, images: List[np.ndarray], conf: float = 0.25) -> List[List[Dict]]:
+        """
+        Phát hiện biển số trên batch nhiều ảnh trong 1 lần predict
+        (batch inference tận dụng GPU/SIMD tốt hơn gọi từng ảnh)
+
+        Args:
+            images: List ảnh đầu vào (numpy arrays)
+            conf: Confidence threshold
+
+        Returns:
+            List detections cho từng ảnh (cùng thứ tự với input)
+        """
+        if not images:
+            return []
+
+        results = self.model.predict(source=images, conf=conf, verbose=False)
+
+        all_detections = []
+
+        for image, result in zip(images, results):
+            boxes = result.boxes
+            detections = []
+
+            if boxes is not None:
+                for box in boxes:
+                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(np.int32).tolist()
+                    confidence = float(box.conf[0])
+
+                    # View vào ảnh nguồn — batch images sống hết vòng xử lý
+                    plate_img = image[y1:y2, x1:x2]
+
+                    detections.append({
+                        'bbox': (x1, y1, x2, y2),
+                        'confidence': confidence,
+                        'plate_image': plate_img
+                    })
+
+            all_detections.append(detections)
+
+        return all_detections
+
     def detect_from_file(self, image_path: str, conf: float = 0.25) -> List[Dict]:
         """
         Phát hiện biển số từ file ảnh
@@ -80,7 +128,10 @@ class PlateDetectorModel:
         Returns:
             List of detections
         """
-        image = cv2.imread(image_path)
+        # fromfile + imdecode: đọc 1 phát không stat() thừa, và mở được
+        # đường dẫn unicode trên Windows (imread thì không)
+        data = np.fromfile(image_path, dtype=np.uint8)
+        image = cv2.imdecode(data, cv2.IMREAD_COLOR)
         if image is None:
             raise ValueError(f"Cannot read image: {image_path}")
         
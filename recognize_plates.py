@@ -5,10 +5,11 @@ Author: AI Assistant
 Date: November 7, 2025
 """
 
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import os
+import queue
+import threading
 from pathlib import Path
 from typing import List, Tuple, Dict
 from utils import create_ocr_processor
@@ -17,26 +18,117 @@ from utils import create_ocr_processor
 class LicensePlateRecognitionSystem:
     """Hệ thống nhận dạng biển số hoàn chỉnh: YOLO + PaddleOCR"""
     
-    def __init__(self, 
+    def __init__(self,
                  detection_model_path: str = 'models/best.pt',
                  use_paddle_ocr: bool = True,
                  use_gpu: bool = False,
-                 ocr_lang: str = 'en'):
+                 ocr_lang: str = 'en',
+                 quantize: str = 'fp16'):
         """
         Khởi tạo hệ thống
-        
+
         Args:
             detection_model_path: Đường dẫn YOLO model
             use_paddle_ocr: Sử dụng PaddleOCR (nếu False dùng EasyOCR)
             use_gpu: Sử dụng GPU
             ocr_lang: Ngôn ngữ OCR ('en', 'ch', 'vi')
+            quantize: Độ chính xác engine khi chạy GPU: 'fp16' hoặc 'int8'
+                      ('int8' cần data calibration ở models/calibration/calib.yaml,
+                      thiếu thì tự rơi về fp16)
         """
+        # Lazy import: ultralytics kéo theo torch (~vài giây import time),
+        # chỉ trả giá khi thật sự dựng system chứ không phải lúc import module
+        from ultralytics import YOLO
+
         # Load YOLO detection model
         if not os.path.exists(detection_model_path):
             raise FileNotFoundError(f"Detection model not found: {detection_model_path}")
-        
-        self.detection_model = YOLO(detection_model_path)
-        print(f"✅ YOLO detection model loaded: {detection_model_path}")
+
+        self.use_gpu = use_gpu
+
+        # GPU: chạy bằng TensorRT engine FP16 (fuse layer + tensor core,
+        # thấp hơn PyTorch eager 2-5x latency). Engine export 1 lần rồi
+        # cache cạnh file .pt; export lỗi (thiếu TensorRT...) thì dùng .pt
+        model_to_load = detection_model_path
+        if use_gpu:
+            engine_path = os.path.splitext(detection_model_path)[0] + '.engine'
+            if not os.path.exists(engine_path):
+                export_kwargs = {
+                    'format': 'engine', 'imgsz': 640,
+                    'device': 0, 'dynamic': True, 'batch': 8
+                }
+
+                # INT8 cần calibration set thật (không calibrate thì TRT
+                # đoán dynamic range, dễ chậm hơn hoặc rớt mAP)
+                calib_yaml = os.path.join(
+                    os.path.dirname(detection_model_path),
+                    'calibration', 'calib.yaml'
+                )
+                if quantize == 'int8' and os.path.exists(calib_yaml):
+                    export_kwargs.update(int8=True, data=calib_yaml)
+                    precision_note = 'INT8'
+                else:
+                    if quantize == 'int8':
+                        print("⚠️ INT8 calibration data not found "
+                              f"({calib_yaml}) - falling back to FP16")
+                    export_kwargs['half'] = True
+                    precision_note = 'FP16'
+
+                try:
+                    print(f"🔧 Exporting TensorRT {precision_note} engine (one-time)...")
+                    YOLO(detection_model_path).export(**export_kwargs)
+                except Exception as e:
+                    print(f"⚠️ TensorRT export failed: {e} - using .pt model")
+            if os.path.exists(engine_path):
+                model_to_load = engine_path
+        else:
+            # CPU: ONNX Runtime (graph optimization + kernel CPU tốt hơn
+            # eager PyTorch 1.5-3x) nếu có onnxruntime; export .onnx 1 lần
+            # rồi cache cạnh .pt
+            try:
+                import onnxruntime  # noqa: F401
+                have_ort = True
+            except ImportError:
+                have_ort = False
+
+            if have_ort:
+                onnx_path = os.path.splitext(detection_model_path)[0] + '.onnx'
+                if not os.path.exists(onnx_path):
+                    try:
+                        print("🔧 Exporting ONNX model for CPU inference (one-time)...")
+                        YOLO(detection_model_path).export(
+                            format='onnx', dynamic=True, simplify=True
+                        )
+                    except Exception as e:
+                        print(f"⚠️ ONNX export failed: {e} - using .pt model")
+                if os.path.exists(onnx_path):
+                    model_to_load = onnx_path
+
+        self.detection_model = YOLO(model_to_load)
+        print(f"✅ YOLO detection model loaded: {model_to_load}")
+
+        # Giữ lại config init cho các worker process (folder mode đa tiến
+        # trình: mỗi worker tự dựng 1 system riêng)
+        self.detection_model_path = detection_model_path
+        self.ocr_lang = ocr_lang
+
+        # Torch tuning 1 lần: cudnn autotune cho input shape cố định
+        # (letterbox 640) + matmul TF32; predict bọc inference_mode để
+        # bỏ hẳn overhead autograd tracking
+        try:
+            import torch
+            torch.backends.cudnn.benchmark = True
+            torch.set_float32_matmul_precision('high')
+            self._torch = torch
+        except ImportError:
+            self._torch = None
+
+        # Có CUDA build của OpenCV thì downscale frame lớn ngay trên GPU
+        # trước khi predict, đỡ 1 lượt resize CPU full-res mỗi frame
+        try:
+            self._use_cuda_resize = use_gpu and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except Exception:
+            self._use_cuda_resize = False
         
         # Initialize OCR processor with PaddleOCR v2.7.3
         self.ocr_processor = create_ocr_processor(
@@ -46,8 +138,12 @@ class LicensePlateRecognitionSystem:
         
         if self.ocr_processor is None:
             raise RuntimeError("Failed to initialize PaddleOCR processor")
-        
+
         print(f"✅ OCR processor initialized")
+
+        # Track IoU đơn giản cho video: cùng 1 biển bám qua nhiều frame thì
+        # chỉ OCR 1 lần, các frame sau tái dùng text
+        self._tracks: List[Dict] = []
     
     def detect_plates(self, image: np.ndarray, conf: float = 0.25) -> List[Dict]:
         """
@@ -60,30 +156,80 @@ class LicensePlateRecognitionSystem:
         Returns:
             List các detection results
         """
-        results = self.detection_model.predict(source=image, conf=conf, verbose=False)
-        
+        infer_image = image
+        scale = 1.0
+
+        # Frame to hơn 640 và có CUDA: resize trên GPU rồi mới đưa vào
+        # predict; bbox quy đổi lại hệ toạ độ gốc khi parse
+        h, w = image.shape[:2]
+        if self._use_cuda_resize and max(h, w) > 640:
+            scale = 640.0 / max(h, w)
+            try:
+                gpu_frame = cv2.cuda_GpuMat()
+                gpu_frame.upload(image)
+                gpu_frame = cv2.cuda.resize(
+                    gpu_frame,
+                    (int(w * scale), int(h * scale)),
+                    interpolation=cv2.INTER_AREA
+                )
+                infer_image = gpu_frame.download()
+            except cv2.error:
+                infer_image = image
+                scale = 1.0
+
+        if self._torch is not None:
+            with self._torch.inference_mode():
+                results = self.detection_model.predict(
+                    source=infer_image, conf=conf,
+                    half=self.use_gpu, verbose=False
+                )
+        else:
+            results = self.detection_model.predict(
+                source=infer_image, conf=conf, verbose=False
+            )
+
         detections = []
-        
         for result in results:
-            boxes = result.boxes
-            if boxes is None:
-                continue
-                
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                confidence = float(box.conf[0])
-                
-                # Crop plate
-                plate_img = image[y1:y2, x1:x2]
-                
-                detection = {
-                    'bbox': (x1, y1, x2, y2),
-                    'confidence': confidence,
-                    'plate_image': plate_img
-                }
-                
-                detections.append(detection)
-        
+            detections.extend(self._parse_detections(image, result, scale))
+
+        return detections
+
+    def _parse_detections(self, image: np.ndarray, result, scale: float = 1.0) -> List[Dict]:
+        """
+        Chuyển 1 kết quả YOLO thành list detection dict (crop kèm bbox)
+
+        Lưu ý: 'plate_image' là numpy view vào `image` (zero-copy) — chỉ
+        valid chừng nào ảnh/frame nguồn chưa bị ghi đè; OCR preprocessing
+        là nơi duy nhất materialize bản copy khi cần
+
+        Args:
+            image: Ảnh gốc để crop
+            result: 1 phần tử kết quả predict
+            scale: Tỉ lệ đã resize trước khi predict (bbox chia ngược lại)
+        """
+        detections = []
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return detections
+
+        # Kéo toàn bộ bbox + conf về CPU trong 2 lần sync thay vì
+        # 2 lần map(int,)/float() cho mỗi box
+        xyxy = boxes.xyxy.cpu().numpy()
+        if scale != 1.0:
+            xyxy = xyxy / scale
+        xyxy = xyxy.astype(np.int32)
+        confs = boxes.conf.cpu().numpy()
+
+        for (x1, y1, x2, y2), confidence in zip(xyxy.tolist(), confs.tolist()):
+            # Crop plate
+            plate_img = image[y1:y2, x1:x2]
+
+            detections.append({
+                'bbox': (x1, y1, x2, y2),
+                'confidence': confidence,
+                'plate_image': plate_img
+            })
+
         return detections
     
     def recognize_plate(self, plate_image: np.ndarray) -> Tuple[str, float]:
@@ -97,30 +243,170 @@ class LicensePlateRecognitionSystem:
             (text, confidence)
         """
         text, conf = self.ocr_processor.recognize_with_multiple_attempts(
-            plate_image, 
+            plate_image,
             max_attempts=3
         )
         return text, conf
+
+    def recognize_plates_batch(self, plate_images: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        Nhận dạng cả list biển số của 1 frame: preprocess gom chung rồi
+        OCR mỗi crop đúng 1 lượt (thay vì tới 3 attempt/plate như
+        recognize_plate)
+
+        Args:
+            plate_images: List ảnh biển số đã crop
+
+        Returns:
+            List (text, confidence) cùng thứ tự với input
+        """
+        if not plate_images:
+            return []
+
+        proc = self.ocr_processor
+        preprocessed = [proc.preprocess_plate_image(p) for p in plate_images]
+
+        # PaddleOCR 2.7.x exit(0) khi .ocr() nhận list lúc det bật (không
+        # phải Exception bắt được) nên gọi từng ảnh; rec bên trong vẫn
+        # batch các dòng của cùng 1 ảnh
+        raw_results = []
+        for pre in preprocessed:
+            try:
+                page = proc.ocr.ocr(pre, cls=True)
+            except Exception as e:
+                print(f"⚠️ Batch OCR failed ({e}), falling back to per-plate OCR")
+                return [self.recognize_plate(p) for p in plate_images]
+            raw_results.append(page[0] if page else None)
+
+        outputs = []
+        for lines in raw_results:
+            if not lines:
+                outputs.append(("", 0.0))
+                continue
+
+            # Sort theo Y (biển 2 tầng đọc trên xuống) rồi ghép text,
+            # giống recognize_text của processor
+            items = []
+            for line in lines:
+                if line and len(line) >= 2:
+                    bbox, (text, conf) = line[0], line[1]
+                    y_pos = sum(point[1] for point in bbox) / len(bbox)
+                    items.append((y_pos, text, conf))
+
+            if not items:
+                outputs.append(("", 0.0))
+                continue
+
+            items.sort()
+            combined = proc.post_process_text(' '.join(t for _, t, _ in items))
+            avg_conf = float(np.mean([c for _, _, c in items]))
+            outputs.append((combined, avg_conf))
+
+        # Phòng hờ engine trả thiếu entry
+        while len(outputs) < len(plate_images):
+            outputs.append(("", 0.0))
+
+        return outputs
+
+    def _recognize_with_tracking(self,
+                                 detections: List[Dict],
+                                 frame_idx: int,
+                                 max_age: int) -> List[Tuple[str, float]]:
+        """
+        OCR các detection của 1 frame, tái dùng text từ track gần đây:
+        box mới IoU > 0.5 với track confidence > 0.85 còn trong hạn
+        max_age frame thì khỏi chạy OCR lại
+
+        Returns:
+            List (text, confidence) cùng thứ tự với detections
+        """
+        if not detections:
+            return []
+
+        # Evict track quá hạn
+        self._tracks = [
+            t for t in self._tracks if frame_idx - t['last_seen'] <= max_age
+        ]
+
+        results: List[Tuple[str, float]] = [("", 0.0)] * len(detections)
+        pending = []
+
+        track_boxes = None
+        track_confs = None
+        if self._tracks:
+            track_boxes = np.array([t['bbox'] for t in self._tracks],
+                                   dtype=np.float32)
+            track_confs = np.array([t['conf'] for t in self._tracks],
+                                   dtype=np.float32)
+
+        for i, detection in enumerate(detections):
+            matched = None
+            if track_boxes is not None:
+                x1, y1, x2, y2 = detection['bbox']
+                ix1 = np.maximum(track_boxes[:, 0], x1)
+                iy1 = np.maximum(track_boxes[:, 1], y1)
+                ix2 = np.minimum(track_boxes[:, 2], x2)
+                iy2 = np.minimum(track_boxes[:, 3], y2)
+                inter = (np.clip(ix2 - ix1, 0, None)
+                         * np.clip(iy2 - iy1, 0, None))
+                area_det = (x2 - x1) * (y2 - y1)
+                area_tracks = ((track_boxes[:, 2] - track_boxes[:, 0])
+                               * (track_boxes[:, 3] - track_boxes[:, 1]))
+                union = np.maximum(area_det + area_tracks - inter, 1e-6)
+                iou = inter / union
+
+                mask = (iou > 0.5) & (track_confs > 0.85)
+                if mask.any():
+                    matched = self._tracks[int(np.argmax(np.where(mask, iou, -1.0)))]
+
+            if matched is not None:
+                results[i] = (matched['text'], matched['conf'])
+                matched['bbox'] = detection['bbox']
+                matched['last_seen'] = frame_idx
+            else:
+                pending.append(i)
+
+        # Box chưa trúng track nào mới phải OCR thật (vẫn batch 1 lần)
+        if pending:
+            ocr_out = self.recognize_plates_batch(
+                [detections[i]['plate_image'] for i in pending]
+            )
+            for i, (text, ocr_conf) in zip(pending, ocr_out):
+                results[i] = (text, ocr_conf)
+                if text:
+                    self._tracks.append({
+                        'bbox': detections[i]['bbox'],
+                        'text': text,
+                        'conf': ocr_conf,
+                        'last_seen': frame_idx
+                    })
+
+        return results
     
-    def process_image(self, 
+    def process_image(self,
                      image_path: str,
                      conf: float = 0.25,
                      save_result: bool = True,
-                     output_dir: str = 'results/paddleocr') -> List[Dict]:
+                     output_dir: str = 'results/paddleocr',
+                     image: np.ndarray | None = None) -> List[Dict]:
         """
         Xử lý ảnh: Phát hiện và nhận dạng biển số
-        
+
         Args:
             image_path: Đường dẫn ảnh
             conf: Confidence threshold
             save_result: Lưu kết quả
             output_dir: Thư mục lưu kết quả
-            
+            image: Ảnh đã decode sẵn (folder mode prefetch đưa vào đây
+                   để khỏi đọc file lần 2)
+
         Returns:
             List kết quả
         """
-        # Read image
-        image = cv2.imread(image_path)
+        # Read image (fromfile + imdecode: 1 lần đọc, path unicode OK)
+        if image is None:
+            data = np.fromfile(image_path, dtype=np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
         if image is None:
             raise FileNotFoundError(f"Cannot read image: {image_path}")
         
@@ -132,14 +418,16 @@ class LicensePlateRecognitionSystem:
         print(f"\n🔍 Detected {len(detections)} license plate(s)")
         
         results = []
-        
-        # Recognize each plate
-        for idx, detection in enumerate(detections, 1):
+
+        # Recognize all plates in one batched OCR call
+        ocr_results = self.recognize_plates_batch(
+            [d['plate_image'] for d in detections]
+        )
+
+        for idx, (detection, (text, ocr_conf)) in enumerate(
+                zip(detections, ocr_results), 1):
             plate_img = detection['plate_image']
-            
-            # OCR
-            text, ocr_conf = self.recognize_plate(plate_img)
-            
+
             result = {
                 'text': text,
                 'detection_confidence': detection['confidence'],
@@ -187,51 +475,113 @@ class LicensePlateRecognitionSystem:
         
         return results
     
-    def process_folder(self, 
+    def process_folder(self,
                       folder_path: str,
                       conf: float = 0.25,
                       output_dir: str = 'results/paddleocr',
-                      max_images: int | None = None) -> Dict:
+                      max_images: int | None = None,
+                      workers: int = 1) -> Dict:
         """
         Xử lý tất cả ảnh trong folder
-        
+
         Args:
             folder_path: Đường dẫn folder
             conf: Confidence threshold
             output_dir: Thư mục lưu kết quả
             max_images: Số ảnh tối đa (None = all)
-            
+            workers: Số process song song (CPU offline: mỗi worker 1 system
+                     riêng, saturate đủ core; GPU nên để 1 và dựa vào batch)
+
         Returns:
             Thống kê kết quả
         """
-        # Get all images
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-        image_files = []
-        
-        for ext in image_extensions:
-            image_files.extend(Path(folder_path).glob(f'*{ext}'))
-            image_files.extend(Path(folder_path).glob(f'*{ext.upper()}'))
-        
+        # Get all images: 1 lượt scandir thay vì 8 lượt glob
+        # (2 case x 4 extension, mỗi lượt walk + stat lại cả folder)
+        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
+        with os.scandir(folder_path) as it:
+            image_files = sorted(
+                (Path(entry.path) for entry in it
+                 if entry.is_file()
+                 and os.path.splitext(entry.name)[1].lower() in image_extensions),
+                key=lambda p: p.name
+            )
+
         if max_images:
             image_files = image_files[:max_images]
         
         print(f"\n📁 Found {len(image_files)} images to process\n")
-        
-        all_results = []
+
         total_plates = 0
-        
-        for idx, img_path in enumerate(image_files, 1):
-            print(f"{'='*70}")
-            print(f"[{idx}/{len(image_files)}] Processing: {img_path.name}")
-            print(f"{'='*70}")
-            
-            try:
-                results = self.process_image(str(img_path), conf, True, output_dir)
-                all_results.extend(results)
-                total_plates += len(results)
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                continue
+
+        if workers > 1:
+            # Mỗi worker process giữ 1 system riêng (init 1 lần, rẻ khi
+            # engine đã cache trên disk) và trả về số plate tìm được
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            init_args = (self.detection_model_path, self.ocr_lang)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_process_image_worker, init_args,
+                                    str(img_path), conf, output_dir): img_path
+                    for img_path in image_files
+                }
+                for idx, future in enumerate(as_completed(futures), 1):
+                    img_path = futures[future]
+                    try:
+                        n_plates = future.result()
+                        total_plates += n_plates
+                        print(f"[{idx}/{len(image_files)}] {img_path.name}: "
+                              f"{n_plates} plate(s)")
+                    except Exception as e:
+                        print(f"❌ Error ({img_path.name}): {e}")
+        else:
+            # Prefetch bytes file kế tiếp trên thread pool trong lúc main
+            # thread đang detect/OCR ảnh hiện tại: disk I/O chồng với compute
+            from collections import deque
+            from concurrent.futures import ThreadPoolExecutor
+
+            def _read_bytes(path: str) -> bytes:
+                with open(path, 'rb') as f:
+                    return f.read()
+
+            all_results = []
+            prefetch_window = 8
+            path_iter = iter(image_files)
+            pending = deque()
+
+            with ThreadPoolExecutor(max_workers=4) as io_pool:
+                for img_path in image_files[:prefetch_window]:
+                    next(path_iter)
+                    pending.append(
+                        (img_path, io_pool.submit(_read_bytes, str(img_path)))
+                    )
+
+                idx = 0
+                while pending:
+                    img_path, future = pending.popleft()
+                    idx += 1
+                    print(f"{'='*70}")
+                    print(f"[{idx}/{len(image_files)}] Processing: {img_path.name}")
+                    print(f"{'='*70}")
+
+                    try:
+                        image = cv2.imdecode(
+                            np.frombuffer(future.result(), np.uint8),
+                            cv2.IMREAD_COLOR
+                        )
+                        results = self.process_image(
+                            str(img_path), conf, True, output_dir, image=image
+                        )
+                        all_results.extend(results)
+                        total_plates += len(results)
+                    except Exception as e:
+                        print(f"❌ Error: {e}")
+
+                    next_path = next(path_iter, None)
+                    if next_path is not None:
+                        pending.append(
+                            (next_path, io_pool.submit(_read_bytes, str(next_path)))
+                        )
         
         # Statistics
         stats = {
@@ -257,38 +607,148 @@ class LicensePlateRecognitionSystem:
                      conf: float = 0.25,
                      output_path: str = 'results/paddleocr/output.mp4',
                      show: bool = True,
-                     process_every_n_frames: int = 1) -> Dict:
+                     process_every_n_frames: int = 1,
+                     batch_size: int = 8) -> Dict:
         """
         Xử lý video
-        
+
         Args:
             video_path: Đường dẫn video
             conf: Confidence threshold
             output_path: Đường dẫn video output
             show: Hiển thị realtime
             process_every_n_frames: Xử lý mỗi N frames
-            
+            batch_size: Số frame gom cho 1 lần YOLO predict (batch inference
+                        tận dụng GPU tốt hơn hẳn forward từng frame)
+
         Returns:
             Thống kê
         """
-        cap = cv2.VideoCapture(video_path)
-        
+        # Backend FFMPEG + buffer 1 frame (decode H.264 chạy ở thread đọc
+        # riêng bên dưới nên không cần driver buffer sâu)
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(video_path)
+
         if not cap.isOpened():
             raise ValueError(f"Cannot open video: {video_path}")
-        
+
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
         # Get video properties
         fps = int(cap.get(cv2.CAP_PROP_FPS))
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        # Video writer
+        # Video writer: GPU thì thử NVENC qua GStreamer trước (encode trên
+        # ASIC riêng của GPU, trả lại 5-20ms/frame x264 cho CPU), không
+        # được thì về mp4v software như cũ
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out = None
+        if self.use_gpu:
+            gst_pipeline = (
+                "appsrc ! videoconvert ! nvh264enc ! h264parse ! mp4mux "
+                f"! filesink location={output_path}"
+            )
+            try:
+                writer = cv2.VideoWriter(gst_pipeline, cv2.CAP_GSTREAMER,
+                                         0, fps, (width, height))
+                if writer.isOpened():
+                    out = writer
+                    print("✅ NVENC hardware encoder enabled")
+                else:
+                    writer.release()
+            except cv2.error:
+                pass
+
+        if out is None:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
         
         frame_count = 0
         processed_count = 0
         detected_texts = set()
+
+        # Ring buffer frame cấp phát sẵn, cap.read(dst) ghi thẳng vào đó
+        # thay vì malloc mỗi frame. Có torch + CUDA thì pin memory: copy
+        # host->GPU từ pinned buffer nhanh ~2x so với pageable
+        frame_slots = []
+        # 2 bank slot luân phiên giữa các vòng: frame của bank trước có thể
+        # còn nằm trong hàng đợi ghi/hiển thị khi bank sau được refill
+        n_slots = 2 * batch_size
+        if self.use_gpu:
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    frame_slots = [
+                        torch.empty((height, width, 3), dtype=torch.uint8,
+                                    pin_memory=True).numpy()
+                        for _ in range(n_slots)
+                    ]
+            except ImportError:
+                pass
+        if not frame_slots:
+            frame_slots = [
+                np.empty((height, width, 3), dtype=np.uint8)
+                for _ in range(n_slots)
+            ]
+
+        # Pipeline 3 tầng: reader thread decode vào slot -> main detect/OCR
+        # -> writer thread encode/hiển thị rồi trả slot về free_q. Slot
+        # luân chuyển qua free_q nên không bao giờ bị refill khi còn nằm
+        # trong hàng đợi ghi
+        frames_q = queue.Queue(maxsize=batch_size)
+        out_q = queue.Queue(maxsize=batch_size)
+        free_q = queue.Queue()
+        for slot_idx in range(n_slots):
+            free_q.put(slot_idx)
+        stop_event = threading.Event()
+
+        def reader_worker():
+            seq = 0
+            while not stop_event.is_set():
+                try:
+                    slot_idx = free_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                ret, _ = cap.read(frame_slots[slot_idx])
+                if not ret:
+                    break
+                seq += 1
+                item = (seq, slot_idx)
+                while not stop_event.is_set():
+                    try:
+                        frames_q.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+            # Sentinel báo hết video — phải đến được main loop, nếu không
+            # consumer spin mãi; chỉ bỏ cuộc khi bị stop chủ động ('q'/lỗi)
+            while not stop_event.is_set():
+                try:
+                    frames_q.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+        def writer_worker():
+            while True:
+                item = out_q.get()
+                if item is None:
+                    break
+                slot_idx, frame = item
+                out.write(frame)
+                free_q.put(slot_idx)
+                if show:
+                    cv2.imshow('License Plate Recognition', frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        stop_event.set()
+                        break
+
+        reader_thread = threading.Thread(target=reader_worker, daemon=True)
+        writer_thread = threading.Thread(target=writer_worker, daemon=True)
+        reader_thread.start()
+        writer_thread.start()
         
         print(f"\n🎥 Processing video: {video_path}")
         print(f"   Resolution: {width}x{height}")
@@ -296,51 +756,135 @@ class LicensePlateRecognitionSystem:
         print(f"   Process every {process_every_n_frames} frame(s)\n")
         
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            eof = False
+            stop = False
+            while not (eof or stop):
+                # Gom 1 cụm frame từ reader thread: chờ frame đầu, các frame
+                # sẵn có lấy nốt (batch nhỏ hơn khi decode chậm hơn compute
+                # - tự cân bằng latency/throughput)
+                frame_buf = []
+                item = None
+                while True:
+                    try:
+                        item = frames_q.get(timeout=0.5)
+                        break
+                    except queue.Empty:
+                        if stop_event.is_set():
+                            stop = True
+                            break
+                if stop:
                     break
-                
-                frame_count += 1
-                
-                # Process every N frames
-                if frame_count % process_every_n_frames == 0:
-                    # Detect and recognize
-                    detections = self.detect_plates(frame, conf)
-                    
-                    for detection in detections:
-                        x1, y1, x2, y2 = detection['bbox']
-                        plate_img = detection['plate_image']
-                        
-                        # OCR
-                        text, ocr_conf = self.recognize_plate(plate_img)
-                        
-                        if text:
-                            detected_texts.add(text)
-                        
-                        # Draw
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        
-                        label = f"{text} ({ocr_conf:.2f})"
-                        cv2.putText(frame, label, (x1, y1-10),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    
-                    processed_count += 1
-                
-                # Write frame
-                out.write(frame)
-                
-                # Show
-                if show:
-                    cv2.imshow('License Plate Recognition', frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                if item is None:
+                    eof = True
+                else:
+                    frame_buf.append(item)
+                    while len(frame_buf) < batch_size:
+                        try:
+                            item = frames_q.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            eof = True
+                            break
+                        frame_buf.append(item)
+
+                if not frame_buf:
+                    break
+
+                frame_buf = [(idx, frame_slots[slot_idx], slot_idx)
+                             for idx, slot_idx in frame_buf]
+                frame_count = max(frame_count, frame_buf[-1][0])
+
+                to_process = [
+                    (i, frame) for i, (idx, frame, _) in enumerate(frame_buf)
+                    if idx % process_every_n_frames == 0
+                ]
+
+                results_by_pos = {}
+                if to_process:
+                    batch_frames = [frame for _, frame in to_process]
+                    if self._torch is not None:
+                        with self._torch.inference_mode():
+                            batch_results = self.detection_model.predict(
+                                source=batch_frames,
+                                conf=conf,
+                                half=self.use_gpu,
+                                verbose=False
+                            )
+                    else:
+                        batch_results = self.detection_model.predict(
+                            source=batch_frames,
+                            conf=conf,
+                            verbose=False
+                        )
+                    for (i, _), result in zip(to_process, batch_results):
+                        results_by_pos[i] = result
+
+                for i, (idx, frame, slot_idx) in enumerate(frame_buf):
+                    result = results_by_pos.get(i)
+                    if result is not None:
+                        # Pass 1: compute (detect + OCR), gom annotation lại
+                        detections = self._parse_detections(frame, result)
+                        ocr_results = self._recognize_with_tracking(
+                            detections, idx, max_age=max(1, fps // 2)
+                        )
+
+                        annotations = []
+                        for detection, (text, ocr_conf) in zip(detections, ocr_results):
+                            if text:
+                                detected_texts.add(text)
+                            annotations.append((detection['bbox'], text, ocr_conf))
+
+                        # Pass 2: render ngay trước khi frame ra output —
+                        # mọi bbox vẽ chung 1 lần polylines, label chỉ
+                        # rasterize khi OCR thật sự có text
+                        if annotations:
+                            pts = np.array(
+                                [[[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+                                 for (x1, y1, x2, y2), _, _ in annotations],
+                                dtype=np.int32
+                            )
+                            cv2.polylines(frame, pts, True, (0, 255, 0), 2)
+
+                            for (x1, y1, x2, y2), text, ocr_conf in annotations:
+                                if not text:
+                                    continue
+                                label = f"{text} ({ocr_conf:.2f})"
+                                cv2.putText(frame, label, (x1, y1-10),
+                                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+                        processed_count += 1
+
+                    # Đẩy sang thread ghi/hiển thị (timeout để không kẹt
+                    # vĩnh viễn nếu writer vừa thoát vì người dùng nhấn q)
+                    while not stop_event.is_set():
+                        try:
+                            out_q.put((slot_idx, frame), timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop_event.is_set():
+                        stop = True
                         break
-                
-                # Progress
-                if frame_count % (fps * 10) == 0:  # Every 10 seconds
-                    print(f"   Processed {frame_count} frames...")
+
+                    # Progress
+                    if idx % (fps * 10) == 0:  # Every 10 seconds
+                        print(f"   Processed {idx} frames...")
         
         finally:
+            # Dừng reader trước, gửi sentinel cho writer rồi mới release
+            # (tránh block nếu queue đầy mà thread kia đã thoát)
+            stop_event.set()
+            reader_thread.join(timeout=2)
+
+            while writer_thread.is_alive():
+                try:
+                    out_q.put(None, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+            writer_thread.join(timeout=2)
+
             cap.release()
             out.release()
             cv2.destroyAllWindows()
@@ -362,6 +906,26 @@ class LicensePlateRecognitionSystem:
         return stats
 
 
+# System riêng cho mỗi worker process của process_folder(workers > 1):
+# init 1 lần khi worker nhận job đầu, các job sau tái dùng
+_worker_system: LicensePlateRecognitionSystem | None = None
+
+
+def _process_image_worker(init_args: tuple, image_path: str,
+                          conf: float, output_dir: str) -> int:
+    """Xử lý 1 ảnh trong worker process, trả về số plate tìm được"""
+    global _worker_system
+    if _worker_system is None:
+        model_path, ocr_lang = init_args
+        _worker_system = LicensePlateRecognitionSystem(
+            detection_model_path=model_path,
+            use_gpu=False,
+            ocr_lang=ocr_lang
+        )
+    results = _worker_system.process_image(image_path, conf, True, output_dir)
+    return len(results)
+
+
 def main():
     """Main function - CLI interface"""
     print("\n" + "="*70)
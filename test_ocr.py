@@ -14,6 +14,18 @@ from controllers import ImageController
 import os
 
 
+def first_image(dirs, exts=('.jpg', '.jpeg', '.png')):
+    """Tìm file ảnh đầu tiên trong list thư mục (scandir + break sớm)"""
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(exts):
+                    return entry.path
+    return None
+
+
 def main():
     print("="*70)
     print("🧪 TESTING OCR FUNCTIONALITY")
@@ -32,16 +44,8 @@ def main():
         'results/images'
     ]
     
-    test_image = None
-    for test_dir in test_dirs:
-        if os.path.exists(test_dir):
-            for file in os.listdir(test_dir):
-                if file.endswith(('.jpg', '.jpeg', '.png')):
-                    test_image = os.path.join(test_dir, file)
-                    break
-            if test_image:
-                break
-    
+    test_image = first_image(test_dirs)
+
     if not test_image:
         print("❌ No test image found!")
         print("   Please add an image to data/images/")
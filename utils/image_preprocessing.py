@@ -7,8 +7,42 @@ Date: November 7, 2025
 
 import cv2
 import numpy as np
-from typing import Tuple, List
-import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple, List, Optional
+
+# Numba là optional: có thì gộp atan2 + lọc + median của fallback Hough
+# vào 1 kernel compiled, không có thì đi đường NumPy vectorized
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+if _HAS_NUMBA:
+    @njit(cache=True)
+    def _reduce_angles(lines, max_lines):
+        """1 pass qua lines: atan2 + lọc |góc|<45 + median, không temporary"""
+        n = min(max_lines, lines.shape[0])
+        angles = np.empty(n, dtype=np.float64)
+        count = 0
+        for i in range(n):
+            x1 = lines[i, 0, 0]
+            y1 = lines[i, 0, 1]
+            x2 = lines[i, 0, 2]
+            y2 = lines[i, 0, 3]
+            angle = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+            if abs(angle) < 45.0:
+                angles[count] = angle
+                count += 1
+        if count == 0:
+            return np.nan
+        return np.median(angles[:count])
+
+    # Warmup lúc import để call thật đầu tiên đã JIT-hot
+    _reduce_angles(np.zeros((1, 1, 4), dtype=np.int32), 20)
 
 
 class AdvancedImagePreprocessor:
@@ -16,7 +50,50 @@ class AdvancedImagePreprocessor:
     
     def __init__(self):
         """Khởi tạo preprocessor"""
-        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        # Structuring elements tạo 1 lần (MORPH_RECT để OpenCV đi đường
+        # separable row+column), khỏi getStructuringElement/np.ones mỗi call
+        self.kern_open = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        self.kern_close = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self.kern_shadow_dilate = cv2.getStructuringElement(
+            cv2.MORPH_RECT, (7, 7))
+
+        # Unsharp mask fuse thành 1 kernel 5x5: 1.5*I - 0.5*G tương đương
+        # filter2D 1 pass (1 đọc/1 ghi) thay vì GaussianBlur + addWeighted
+        # (3 đọc/2 ghi + temporary) - bước này memory-bound
+        g1d = cv2.getGaussianKernel(5, 2.0)
+        gauss2d = g1d @ g1d.T
+        self.sharpen_kernel = (-0.5 * gauss2d).astype(np.float32)
+        self.sharpen_kernel[2, 2] += 1.5
+
+        # Góc skew cluster quanh vài giá trị: bucket 0.25 độ và memoize
+        # ma trận xoay 2x3 (LRU, chỉ cache ma trận chứ không cache ảnh)
+        self._rot_cache: OrderedDict = OrderedDict()
+
+        # Scratch buffers ping-pong cho các bước trung gian, tái dùng
+        # giữa các crop cùng shape. Thread-local vì batch_recognize /
+        # multiple_attempts preprocess trên ThreadPool; CLAHE cũng nằm
+        # đây (CLAHE_Impl giữ buffer nội bộ, apply() đồng thời trên 1
+        # instance share là data race)
+        self._tls = threading.local()
+
+    @property
+    def clahe(self):
+        """CLAHE của thread hiện tại (tạo lazy 1 lần mỗi thread)"""
+        clahe = getattr(self._tls, 'clahe', None)
+        if clahe is None:
+            clahe = self._tls.clahe = cv2.createCLAHE(
+                clipLimit=2.0, tileGridSize=(8, 8))
+        return clahe
+
+    def _get_buffers(self, image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Lấy cặp buffer trung gian khớp shape/dtype (per-thread)"""
+        tls = self._tls
+        key = (image.shape, image.dtype)
+        if getattr(tls, 'buf_key', None) != key:
+            tls.buf_a = np.empty_like(image)
+            tls.buf_b = np.empty_like(image)
+            tls.buf_key = key
+        return tls.buf_a, tls.buf_b
     
     def auto_canny(self, image: np.ndarray, sigma: float = 0.33) -> np.ndarray:
         """
@@ -29,7 +106,12 @@ class AdvancedImagePreprocessor:
         Returns:
             Ảnh edges
         """
-        v = np.median(image)
+        # Median qua histogram 256 bin (O(N) calcHist SIMD + cumsum) thay
+        # np.median sort toàn bộ pixel O(N log N) + copy; chỉ đúng cho uint8
+        assert image.dtype == np.uint8
+        hist = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+        cum = np.cumsum(hist)
+        v = int(np.searchsorted(cum, cum[-1] / 2))
         lower = int(max(0, (1.0 - sigma) * v))
         upper = int(min(255, (1.0 + sigma) * v))
         edged = cv2.Canny(image, lower, upper)
@@ -55,46 +137,189 @@ class AdvancedImagePreprocessor:
         if gray.shape[0] < 20 or gray.shape[1] < 20:
             return image, 0.0
         
+        # Ước lượng góc trên bản tối đa 512px: Canny/Hough đều O(pixels),
+        # downscale 4x là ~16x ít việc; góc scale-invariant nên xoay vẫn
+        # áp lên ảnh gốc full-res
+        scale = 512.0 / max(gray.shape)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                              interpolation=cv2.INTER_AREA)
+
         # Detect edges
         edges = self.auto_canny(gray)
-        
-        # Hough Line Transform để tìm góc nghiêng
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50, 
-                                minLineLength=min(50, gray.shape[1]//2), 
-                                maxLineGap=10)
-        
-        if lines is None or len(lines) == 0:
-            return image, 0.0
-        
-        # Tính góc - chỉ lấy tối đa 20 lines để tăng tốc
-        angles = []
-        max_lines = min(20, len(lines))
-        for i in range(max_lines):
-            x1, y1, x2, y2 = lines[i][0]
-            angle = math.degrees(math.atan2(y2 - y1, x2 - x1))
-            angles.append(angle)
-        
-        # Lọc các góc outliers
-        angles = np.array(angles)
-        angles = angles[np.abs(angles) < 45]  # Chỉ lấy góc < 45 độ
-        
-        if len(angles) == 0:
-            return image, 0.0
-        
-        median_angle = np.median(angles)
-        
+
+        # Projection profile (Radon xấp xỉ): rẻ và ổn định hơn Hough
+        # trên crop ít line; peak yếu thì fallback Hough
+        median_angle = self._projection_profile_skew(edges)
+        if median_angle is None:
+            median_angle = self._hough_skew(edges, gray.shape[1])
+            if median_angle is None:
+                return image, 0.0
+
         # Xoay ảnh
         if abs(median_angle) > 0.5:  # Chỉ xoay nếu góc > 0.5 độ
             h, w = image.shape[:2]
             center = (w // 2, h // 2)
-            M = cv2.getRotationMatrix2D(center, median_angle, 1.0)
-            rotated = cv2.warpAffine(image, M, (w, h), 
+
+            # Bucket 0.25 độ + memoize ma trận xoay theo (góc, w, h):
+            # góc skew cluster mạnh nên cache hit cao, đỡ trig mỗi call
+            angle = round(median_angle * 4) / 4.0
+            key = (angle, w, h)
+            M = self._rot_cache.get(key)
+            if M is None:
+                M = cv2.getRotationMatrix2D(center, angle, 1.0)
+                self._rot_cache[key] = M
+                if len(self._rot_cache) > 120:
+                    self._rot_cache.popitem(last=False)
+            else:
+                self._rot_cache.move_to_end(key)
+
+            rotated = cv2.warpAffine(image, M, (w, h),
                                     flags=cv2.INTER_CUBIC,
                                     borderMode=cv2.BORDER_REPLICATE)
-            return rotated, median_angle
-        
+            return rotated, angle
+
         return image, 0.0
-    
+
+    def _projection_profile_skew(self, edges: np.ndarray) -> Optional[float]:
+        """
+        Ước lượng góc nghiêng bằng projection profile: xoay edge map theo
+        lưới góc thô, góc nào cho variance row-sum lớn nhất là góc text
+        thẳng hàng. Chỉ NumPy sum + warpAffine NEAREST trên bản downscale,
+        không cần merge line hay atan2 từng line.
+
+        Returns:
+            Góc (độ) hoặc None nếu peak quá yếu (nên fallback Hough)
+        """
+        h, w = edges.shape[:2]
+
+        # Downscale edge map: độ phân giải góc không cần nhiều pixel
+        target_w = max(128, w // 4)
+        if w > target_w:
+            small = cv2.resize(edges, (target_w, max(16, h * target_w // w)),
+                               interpolation=cv2.INTER_NEAREST)
+        else:
+            small = edges
+
+        sh, sw = small.shape[:2]
+        center = (sw // 2, sh // 2)
+        thetas = np.arange(-15.0, 15.25, 0.5)
+        scores = np.empty(len(thetas), dtype=np.float64)
+
+        for i, theta in enumerate(thetas):
+            M = cv2.getRotationMatrix2D(center, float(theta), 1.0)
+            rot = cv2.warpAffine(small, M, (sw, sh),
+                                 flags=cv2.INTER_NEAREST)
+            scores[i] = np.var(rot.sum(axis=1, dtype=np.int64))
+
+        best = scores.max()
+        baseline = np.median(scores)
+        if baseline <= 0 or best / baseline < 1.3:
+            # Peak không rõ (ảnh nhiễu/ít cạnh) -> để Hough quyết
+            return None
+
+        return float(thetas[int(scores.argmax())])
+
+    def _hough_skew(self, edges: np.ndarray, width: int) -> Optional[float]:
+        """Fallback: ước lượng góc bằng HoughLinesP (đường cũ)"""
+        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50,
+                                minLineLength=min(50, width//2),
+                                maxLineGap=10)
+
+        if lines is None or len(lines) == 0:
+            return None
+
+        # Có Numba: 1 kernel fused atan2 + lọc + median, không mảng tạm
+        if _HAS_NUMBA:
+            median = _reduce_angles(np.ascontiguousarray(lines), 20)
+            return None if np.isnan(median) else float(median)
+
+        # Tính góc vectorized - chỉ lấy tối đa 20 lines để tăng tốc:
+        # arctan2/degrees ghi thẳng vào buffer 20 phần tử preallocated
+        # (per-thread), lọc bằng compress thay fancy-index, không temp abs
+        tls = self._tls
+        angle_buf = getattr(tls, 'angle_buf', None)
+        if angle_buf is None:
+            angle_buf = tls.angle_buf = np.empty(20, dtype=np.float32)
+
+        n = min(20, len(lines))
+        pts = lines[:n, 0].astype(np.float32)
+        buf = angle_buf[:n]
+        np.arctan2(pts[:, 3] - pts[:, 1], pts[:, 2] - pts[:, 0], out=buf)
+        np.degrees(buf, out=buf)
+
+        # Lọc các góc outliers (|góc| < 45 độ, mask branchless)
+        angles = np.compress((buf > -45) & (buf < 45), buf)
+
+        if len(angles) == 0:
+            return None
+
+        return float(np.median(angles))
+
+    def _quality_probe(self, image: np.ndarray) -> dict:
+        """
+        Probe chất lượng rẻ tiền trên bản downscale để quyết định stage
+        nào đáng chạy: crop sáng đều, nét và thẳng (đa số đầu ra của
+        detector tốt) thì khỏi deskew/denoise/remove_shadows
+
+        Returns:
+            Dict flags: needs_rotate / needs_denoise / needs_shadow /
+            needs_contrast
+        """
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+
+        if max(gray.shape) > 256:
+            scale = 256.0 / max(gray.shape)
+            gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                              interpolation=cv2.INTER_AREA)
+
+        mean = float(gray.mean())
+        lap_var = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+        # Độ thẳng: gradient của text thẳng cluster quanh 0/90 độ;
+        # lệch median lớn nghĩa là crop nghiêng
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1)
+        mag = np.abs(gx) + np.abs(gy)
+        strong = mag > 2.0 * mag.mean()
+        if strong.any():
+            ang = np.degrees(np.arctan2(gy[strong], gx[strong])) % 90.0
+            skew_dev = float(np.median(np.minimum(ang, 90.0 - ang)))
+        else:
+            skew_dev = 0.0
+
+        # Chiếu sáng không đều: background box-blur còn dao động mạnh
+        bg = cv2.boxFilter(gray, -1, (31, 31), normalize=True,
+                           borderType=cv2.BORDER_REPLICATE)
+        uneven = float(bg.std())
+
+        return {
+            'needs_rotate': skew_dev > 5.0,
+            'needs_denoise': lap_var <= 300.0,
+            'needs_shadow': uneven > 25.0,
+            'needs_contrast': mean < 80.0 or mean > 180.0 or gray.std() < 40.0,
+        }
+
+    def _sharpness_score(self, image: np.ndarray) -> float:
+        """
+        Chấm độ nét bằng variance của Laplacian trên bản downscale
+        (cao = nét, thấp = mờ) - rẻ so với NL-means nó giúp né được
+        """
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+
+        if max(gray.shape) > 256:
+            scale = 256.0 / max(gray.shape)
+            gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                              interpolation=cv2.INTER_AREA)
+
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
     def enhance_contrast(self, image: np.ndarray) -> np.ndarray:
         """
         Tăng cường độ tương phản cho ảnh tối/ngược sáng
@@ -106,42 +331,88 @@ class AdvancedImagePreprocessor:
             Ảnh đã tăng cường
         """
         if len(image.shape) == 3:
-            # Convert to LAB color space
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            
-            # Apply CLAHE to L channel
-            l = self.clahe.apply(l)
-            
-            # Merge and convert back
-            enhanced = cv2.merge([l, a, b])
-            enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
-            return enhanced
+            # YCrCb thay LAB: conversion integer SIMD (LAB cần gamma +
+            # cube root float mỗi pixel), kênh Y chính là luminance CLAHE cần
+            buf_a, _ = self._get_buffers(image)
+            ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb, dst=buf_a)
+
+            # extractChannel/insertChannel: không cấp phát 3 plane như
+            # split/merge
+            y = cv2.extractChannel(ycrcb, 0)
+            y = self.clahe.apply(y)
+            cv2.insertChannel(y, ycrcb, 0)
+
+            # Bước cuối cấp phát mới: output trả ra không alias scratch buffer
+            return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
         else:
             # Grayscale image
             return self.clahe.apply(image)
     
-    def denoise_image(self, image: np.ndarray, fast_mode: bool = True) -> np.ndarray:
+    def denoise_image(self, image: np.ndarray, fast_mode: bool = True,
+                      grayscale_ok: bool = False) -> np.ndarray:
         """
         Giảm nhiễu cho ảnh mờ (OPTIMIZED)
-        
+
         Args:
             image: Ảnh đầu vào
             fast_mode: Dùng mode nhanh (h=5) thay vì chính xác (h=10)
-            
+            grayscale_ok: Caller chỉ cần luminance (OCR) -> convert gray
+                rồi denoise 1 kênh, rẻ hơn NLM màu ~2x và đỡ 3x băng thông
+
         Returns:
             Ảnh đã giảm nhiễu
         """
         h_value = 5 if fast_mode else 10
-        
+
         if len(image.shape) == 3:
+            if grayscale_ok:
+                # OCR không dùng màu: denoise trên gray thay vì 3 kênh BGR
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                return self._nlmeans_tiled(
+                    gray,
+                    lambda t: cv2.fastNlMeansDenoising(t, None, h_value, 7, 21))
             # Color image - fastNlMeansDenoisingColored
-            denoised = cv2.fastNlMeansDenoisingColored(image, None, h_value, h_value, 7, 21)
+            denoised = self._nlmeans_tiled(
+                image,
+                lambda t: cv2.fastNlMeansDenoisingColored(
+                    t, None, h_value, h_value, 7, 21))
         else:
             # Grayscale - fastNlMeansDenoising
-            denoised = cv2.fastNlMeansDenoising(image, None, h_value, 7, 21)
-        
+            denoised = self._nlmeans_tiled(
+                image,
+                lambda t: cv2.fastNlMeansDenoising(t, None, h_value, 7, 21))
+
         return denoised
+
+    def _nlmeans_tiled(self, image: np.ndarray, denoise_fn) -> np.ndarray:
+        """
+        Crop lớn thì cắt thành các strip ngang (halo 21px = search window)
+        và NL-means song song trên ThreadPool - OpenCV nhả GIL nên scale
+        gần tuyến tính theo core. Crop nhỏ gọi thẳng cho đỡ overhead
+        """
+        h = image.shape[0]
+        if image.shape[0] * image.shape[1] <= 200_000:
+            return denoise_fn(image)
+
+        halo = 21
+        n = min(os.cpu_count() or 1, max(1, h // (2 * halo)))
+        if n <= 1:
+            return denoise_fn(image)
+
+        bounds = [(i * h) // n for i in range(n + 1)]
+
+        def _strip(i):
+            y0, y1 = bounds[i], bounds[i + 1]
+            ty0, ty1 = max(0, y0 - halo), min(h, y1 + halo)
+            out = denoise_fn(image[ty0:ty1])
+            # Cắt bỏ halo, giữ đúng phần strip của mình
+            return out[y0 - ty0:y0 - ty0 + (y1 - y0)]
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            parts = list(pool.map(_strip, range(n)))
+
+        return np.vstack(parts)
     
     def sharpen_image(self, image: np.ndarray) -> np.ndarray:
         """
@@ -153,10 +424,10 @@ class AdvancedImagePreprocessor:
         Returns:
             Ảnh đã làm nét
         """
-        # Unsharp masking
-        gaussian = cv2.GaussianBlur(image, (0, 0), 2.0)
-        sharpened = cv2.addWeighted(image, 1.5, gaussian, -0.5, 0)
-        return sharpened
+        # Unsharp masking fused: 1 pass filter2D với kernel precomputed
+        # (xem __init__), không cấp phát ảnh blur trung gian
+        return cv2.filter2D(image, -1, self.sharpen_kernel,
+                            borderType=cv2.BORDER_REPLICATE)
     
     def adaptive_threshold(self, image: np.ndarray) -> np.ndarray:
         """
@@ -193,19 +464,29 @@ class AdvancedImagePreprocessor:
         else:
             gray = image.copy()
         
-        # Dilate để tạo background
-        dilated = cv2.dilate(gray, np.ones((7, 7), np.uint8))
-        
-        # Median blur
-        bg = cv2.medianBlur(dilated, 21)
-        
-        # Subtract background
-        diff = 255 - cv2.absdiff(gray, bg)
-        
-        # Normalize
-        normalized = cv2.normalize(diff, None, 0, 255, cv2.NORM_MINMAX)
-        
-        return normalized
+        # Các bước trung gian ghi vào scratch buffer ping-pong (đỡ mấy
+        # lần malloc full-size mỗi call)
+        buf_a, buf_b = self._get_buffers(gray)
+
+        # Dilate để tạo background (kernel rect precomputed, separable)
+        dilated = cv2.dilate(gray, self.kern_shadow_dilate, dst=buf_a)
+        
+        # Ước lượng background bằng box blur: separable O(1)/pixel qua
+        # integral image, medianBlur ksize=21 rớt khỏi fast path histogram
+        # của OpenCV (O(k)/pixel); với low-freq illumination thì không
+        # cần median
+        bg = cv2.boxFilter(dilated, -1, (21, 21), normalize=True,
+                           borderType=cv2.BORDER_REPLICATE, dst=buf_b)
+        
+        # Invert + normalize fuse vào 1 convertScaleAbs: tính sẵn alpha/beta
+        # từ min/max của absdiff thay vì 3 pass (subtract + normalize riêng)
+        d = cv2.absdiff(gray, bg, dst=buf_a)
+        mn, mx = int(d.min()), int(d.max())
+        alpha = -255.0 / max(mx - mn, 1)
+        beta = 255.0 - alpha * mn
+
+        # Bước cuối cấp phát mới: output không alias scratch buffer
+        return cv2.convertScaleAbs(d, alpha=alpha, beta=beta)
     
     def morphological_operations(self, image: np.ndarray) -> np.ndarray:
         """
@@ -218,12 +499,10 @@ class AdvancedImagePreprocessor:
             Ảnh đã làm sạch
         """
         # Remove small noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-        cleaned = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
-        
+        cleaned = cv2.morphologyEx(image, cv2.MORPH_OPEN, self.kern_open)
+
         # Close gaps
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel)
+        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, self.kern_close)
         
         return cleaned
     
@@ -232,10 +511,11 @@ class AdvancedImagePreprocessor:
                                  enhance_contrast: bool = True,
                                  denoise: bool = True,
                                  sharpen: bool = True,
-                                 remove_shadow: bool = True) -> Tuple[np.ndarray, dict]:
+                                 remove_shadow: bool = True,
+                                 grayscale_ok: bool = False) -> Tuple[np.ndarray, dict]:
         """
         Pipeline đầy đủ xử lý ảnh biển số
-        
+
         Args:
             image: Ảnh đầu vào
             auto_rotate: Tự động xoay chỉnh góc
@@ -243,22 +523,37 @@ class AdvancedImagePreprocessor:
             denoise: Giảm nhiễu
             sharpen: Làm nét
             remove_shadow: Loại bỏ bóng
-            
+            grayscale_ok: Cho phép đi pipeline 1 kênh (OCR chỉ cần
+                luminance) - bỏ hẳn round-trip BGR->LAB->BGR
+
         Returns:
             (ảnh đã xử lý, thông tin debug)
         """
         debug_info = {}
         processed = image.copy()
-        
+
         # 1. Auto rotate (deskew)
         if auto_rotate:
             processed, angle = self.deskew_image(processed)
             debug_info['rotation_angle'] = angle
-        
-        # 2. Denoise
+
+        # 2. Denoise - gate theo độ nét: crop đã sắc nét thì NL-means
+        # (bước đắt nhất pipeline) là việc thừa
         if denoise:
-            processed = self.denoise_image(processed)
-            debug_info['denoised'] = True
+            lap_var = self._sharpness_score(processed)
+            if lap_var > 200:
+                debug_info['denoise_skipped'] = True
+                denoise = False
+            else:
+                # Ảnh mờ nặng mới đáng trả giá NL-means h=10
+                processed = self.denoise_image(
+                    processed, fast_mode=(lap_var >= 50),
+                    grayscale_ok=grayscale_ok)
+                debug_info['denoised'] = True
+        if not denoise and grayscale_ok and len(processed.shape) == 3:
+            # Không denoise vẫn convert gray 1 lần để các bước sau
+            # (shadows/CLAHE/sharpen) chạy đường 1 kênh
+            processed = cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY)
         
         # 3. Remove shadows
         if remove_shadow:
@@ -289,14 +584,20 @@ class AdvancedImagePreprocessor:
         Returns:
             Ảnh đã xử lý sẵn sàng cho OCR
         """
-        # Full pipeline
+        # Probe rẻ quyết định stage nào đáng chạy: crop sạch (trường hợp
+        # phổ biến từ detector tốt) chỉ còn sharpen + contrast nhẹ
+        probe = self._quality_probe(image)
+
+        # Full pipeline - OCR chỉ cần luminance nên chạy đường grayscale
+        # (denoise/CLAHE/sharpen 1 kênh thay vì 3)
         processed, _ = self.preprocess_full_pipeline(
             image,
-            auto_rotate=True,
-            enhance_contrast=True,
-            denoise=True,
+            auto_rotate=probe['needs_rotate'],
+            enhance_contrast=probe['needs_contrast'],
+            denoise=probe['needs_denoise'],
             sharpen=True,
-            remove_shadow=True
+            remove_shadow=probe['needs_shadow'],
+            grayscale_ok=True
         )
         
         # Resize if needed
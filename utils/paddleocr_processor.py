@@ -9,6 +9,8 @@ Date: November 7, 2025
 import cv2
 import numpy as np
 import os
+import re
+import threading
 from typing import List, Tuple, Dict, Optional
 from .image_preprocessing import AdvancedImagePreprocessor
 
@@ -16,30 +18,99 @@ from .image_preprocessing import AdvancedImagePreprocessor
 class PaddleOCRProcessor:
     """OCR Processor sử dụng PaddleOCR"""
     
-    def __init__(self, 
+    def __init__(self,
                  lang: str = 'en',
                  use_gpu: bool = False,
-                 use_angle_cls: bool = True):
+                 use_angle_cls: bool = True,
+                 early_stop_conf: float = 0.85,
+                 second_stop_conf: float = 0.7):
         """
         Khởi tạo PaddleOCR
-        
+
         Args:
             lang: Ngôn ngữ ('en', 'ch', 'vi')
             use_gpu: Sử dụng GPU
             use_angle_cls: Sử dụng angle classifier (xoay ảnh tự động)
+            early_stop_conf: Confidence attempt 1 đủ cao để bỏ các attempt sau
+            second_stop_conf: Confidence attempt 2 đủ cao để bỏ attempt 3
         """
+        self.early_stop_conf = early_stop_conf
+        self.second_stop_conf = second_stop_conf
+
+        # Bảng translate precompute cho post_process_text: thay vòng lặp
+        # Python từng ký tự (dict lookup + isalpha/isdigit mỗi char) bằng
+        # str.translate chạy C-level trên từng slice vị trí
+        self._strip_ws = str.maketrans('', '', ' \n\t')
+        self._strip_sep = str.maketrans('', '', '-.')
+        self._symbol_trans = str.maketrans({'|': '1', '/': '1', '\\': '1'})
+        self._non_alnum_re = re.compile(r'[^0-9A-Z]')
+        # Vị trí 0-1 (mã tỉnh): chỉ sửa các cặp dễ nhầm
+        self._digit_head_trans = str.maketrans({
+            'O': '0', 'Q': '0', 'I': '1', 'L': '1',
+            'Z': '2', 'S': '5', 'G': '6', 'B': '8'
+        })
+        # Vị trí 2 (loại xe): số -> chữ gần giống, chữ cấm -> chữ hợp lệ
+        self._letter_trans = str.maketrans({
+            '0': 'O', '1': 'I', '3': 'B', '5': 'S', '6': 'G', '8': 'B',
+            'I': 'L', 'O': 'D', 'Q': 'D', 'W': 'V'
+        })
+        # Vị trí 3+: ép mọi chữ về số
+        self._digit_tail_trans = str.maketrans({
+            'O': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5',
+            'G': '6', 'B': '8', 'A': '4', 'C': '0', 'D': '0', 'E': '3',
+            'F': '7', 'H': '4', 'J': '1', 'K': '1', 'M': '11', 'N': '1',
+            'P': '9', 'R': '8', 'T': '7', 'U': '0', 'V': '5', 'X': '8',
+            'Y': '7'
+        })
+        # Sau replacement vẫn còn thì là ký tự cấm trong biển VN
+        self._invalid_letter_re = re.compile(r'[IOQW]')
         try:
             from paddleocr import PaddleOCR
-            
-            # PaddleOCR 2.7.3 parameters
-            self.ocr = PaddleOCR(
-                use_angle_cls=use_angle_cls,
-                lang=lang,
-                use_gpu=use_gpu
-            )
+
+            # PaddleOCR 2.7.3 parameters + high-performance inference:
+            # enable_hpi để Paddle tự chọn backend nhanh (TRT/ONNX/OpenVINO)
+            # và precision fp16 trên GPU; version cũ không nhận flag thì
+            # rơi dần về init chuẩn
+            base_kwargs = {
+                'use_angle_cls': use_angle_cls,
+                'lang': lang,
+                'use_gpu': use_gpu
+            }
+            try:
+                self.ocr = PaddleOCR(
+                    enable_hpi=True,
+                    precision='fp16' if use_gpu else 'fp32',
+                    **base_kwargs
+                )
+            except TypeError:
+                try:
+                    self.ocr = PaddleOCR(use_tensorrt=use_gpu, **base_kwargs)
+                except TypeError:
+                    self.ocr = PaddleOCR(**base_kwargs)
             
             self.preprocessor = AdvancedImagePreprocessor()
             self.available = True
+            self.use_angle_cls = use_angle_cls
+
+            # Đường tắt rec-only: crop biển đã chính là vùng text nên với
+            # biển 1 tầng có thể bỏ hẳn det model (một nửa công inference)
+            self._text_recognizer = getattr(self.ocr, 'text_recognizer', None)
+            self._text_classifier = getattr(self.ocr, 'text_classifier', None)
+
+            # GPU preprocessing qua cv2.cuda: upload crop 1 lần, chạy
+            # gray/CLAHE/sharpen trên device, download 1 lần - tránh
+            # ping-pong CPU-GPU trước khi PaddleOCR upload lại
+            try:
+                self.cuda = use_gpu and cv2.cuda.getCudaEnabledDeviceCount() > 0
+            except Exception:
+                self.cuda = False
+            if self.cuda:
+                # Stream/CLAHE/filter giữ state nội bộ trên device nên
+                # per-thread (preprocess chạy trên ThreadPool ở
+                # batch_recognize / multiple_attempts), tạo lazy ở
+                # _preprocess_gpu
+                self._gpu_tls = threading.local()
+                print("🔧 Preprocessing chạy trên cv2.cuda")
             print(f"✅ PaddleOCR v2.7.3 initialized successfully (lang={lang}, gpu={use_gpu})")
             
         except ImportError as e:
@@ -65,10 +136,51 @@ class PaddleOCRProcessor:
         """
         if self.preprocessor is None:
             return image
-        
+
+        if getattr(self, 'cuda', False):
+            try:
+                return self._preprocess_gpu(image)
+            except cv2.error as e:
+                # Build OpenCV không đủ module cuda* -> về CPU luôn
+                print(f"⚠️ cv2.cuda preprocessing lỗi, fallback CPU: {e}")
+                self.cuda = False
+
         # Apply full preprocessing pipeline
         processed = self.preprocessor.preprocess_for_ocr(image)
         return processed
+
+    def _preprocess_gpu(self, image: np.ndarray) -> np.ndarray:
+        """
+        Pipeline preprocessing rút gọn trên GPU: deskew ước lượng trên CPU
+        (bản downscale, rẻ), còn gray + CLAHE + sharpen chạy hết trên
+        GpuMat trong 1 stream, chỉ download kết quả cuối
+        """
+        # Deskew trên CPU trước (Hough/projection không có đường cuda gọn)
+        image, _ = self.preprocessor.deskew_image(image)
+
+        # Stream + filter per-thread: mỗi worker preprocess có bộ riêng
+        tls = self._gpu_tls
+        if getattr(tls, 'stream', None) is None:
+            tls.stream = cv2.cuda.Stream()
+            tls.clahe = cv2.cuda.createCLAHE(
+                clipLimit=2.0, tileGridSize=(8, 8))
+            tls.sharpen = cv2.cuda.createLinearFilter(
+                cv2.CV_8UC1, cv2.CV_8UC1,
+                self.preprocessor.sharpen_kernel)
+
+        g = cv2.cuda_GpuMat()
+        g.upload(image, tls.stream)
+
+        if len(image.shape) == 3:
+            g = cv2.cuda.cvtColor(g, cv2.COLOR_BGR2GRAY,
+                                  stream=tls.stream)
+
+        g = tls.clahe.apply(g, tls.stream)
+        g = tls.sharpen.apply(g, stream=tls.stream)
+
+        out = g.download(tls.stream)
+        tls.stream.waitForCompletion()
+        return out
     
     def recognize_text(self, 
                       image: np.ndarray, 
@@ -94,6 +206,25 @@ class PaddleOCRProcessor:
             image = self.preprocess_plate_image(image)
         
         try:
+            # Crop 1 tầng (bản rộng, 1 dòng text): bỏ det, gọi thẳng
+            # recognizer - biển 2 tầng (crop vuông hơn) vẫn cần det để
+            # tách 2 dòng và sort theo Y
+            h, w = image.shape[:2]
+            if self._text_recognizer is not None and w >= 2.5 * h:
+                try:
+                    # Recognizer/classifier cần 3 kênh (transpose CHW),
+                    # crop preprocess giờ là grayscale
+                    imgs = [self._rec_input(image)]
+                    if self.use_angle_cls and self._text_classifier is not None:
+                        imgs, _, _ = self._text_classifier(imgs)
+                    rec_res, _ = self._text_recognizer(imgs)
+                    if rec_res:
+                        text, conf = rec_res[0]
+                        return self.post_process_text(text), float(conf)
+                except Exception:
+                    # API nội bộ đổi giữa các version -> về đường ocr() chuẩn
+                    pass
+
             # OCR
             results = self.ocr.ocr(image, cls=True)
             
@@ -157,36 +288,32 @@ class PaddleOCRProcessor:
         """
         if not self.available:
             return "", 0.0
-        
-        results = []
-        
-        # Attempt 1: Full preprocessing
-        text1, conf1 = self.recognize_text(image, preprocess=True)
-        results.append((text1, conf1, "full_preprocess"))
-        
-        if max_attempts > 1:
-            # Attempt 2: Original image
-            text2, conf2 = self.recognize_text(image, preprocess=False)
-            results.append((text2, conf2, "original"))
-        
-        if max_attempts > 2:
-            # Attempt 3: Only contrast enhancement
-            enhanced = self.preprocessor.enhance_contrast(image)
-            text3, conf3 = self.recognize_text(enhanced, preprocess=False)
-            results.append((text3, conf3, "contrast_only"))
-        
-        # Select best result
-        valid_results = [(t, c, m) for t, c, m in results if len(t) > 0]
-        
+
+        # Preprocess các variant song song trên ThreadPool (OpenCV nhả
+        # GIL) rồi OCR cả 3 qua _recognize_crops: crop rộng đi chung 1
+        # call rec-only batch=3 thay vì 3 forward batch=1 (không đưa
+        # list vào .ocr() - 2.7.x exit(0) khi det bật nhận list)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            fut_pre = pool.submit(self.preprocess_plate_image, image)
+            fut_enh = None
+            if max_attempts > 2:
+                fut_enh = pool.submit(self.preprocessor.enhance_contrast, image)
+
+            variants = [fut_pre.result()]
+            if max_attempts > 1:
+                variants.append(image)
+            if fut_enh is not None:
+                variants.append(fut_enh.result())
+
+        # Select best result theo confidence
+        results = self._recognize_crops(variants)
+        valid_results = [(t, c) for t, c in results if len(t) > 0]
+
         if not valid_results:
             return "", 0.0
-        
-        # Sort by confidence
-        valid_results.sort(key=lambda x: x[1], reverse=True)
-        
-        best_text, best_conf, method = valid_results[0]
-        
-        return best_text, best_conf
+
+        return max(valid_results, key=lambda x: x[1])
     
     def post_process_text(self, text: str) -> str:
         """
@@ -199,58 +326,35 @@ class PaddleOCRProcessor:
         Returns:
             Text đã xử lý
         """
-        # Remove spaces and newlines (xử lý biển số 2 tầng)
-        text = text.replace(" ", "").replace("\n", "").replace("\t", "")
-        
-        # Convert to uppercase
-        text = text.upper()
-        
-        # Dictionary ánh xạ ký tự dễ nhầm lẫn
-        # Dựa vào quy tắc biển số Việt Nam
-        char_corrections = {
-            # Số 0 vs chữ O
-            'O': '0',   # O -> 0 (ưu tiên số)
-            'Q': '0',   # Q -> 0
-            
-            # Số 1 vs chữ I, L
-            'I': '1',   # I -> 1
-            'L': '1',   # L -> 1 (trong một số font)
-            
-            # Số 2 vs chữ Z
-            'Z': '2',   # Z -> 2
-            
-            # Số 5 vs chữ S
-            'S': '5',   # S -> 5 (ở vị trí số)
-            
-            # Số 6 vs chữ G
-            'G': '6',   # G -> 6 (hiếm gặp)
-            
-            # Số 8 vs chữ B
-            'B': '8',   # B -> 8 (ở vị trí số)
-            
-            # Ký tự không hợp lệ trong biển số VN
-            '|': '1',   # Đường thẳng -> 1
-            '/': '1',   # Slash -> 1
-            '\\': '1',  # Backslash -> 1
-        }
-        
-        # Apply smart replacement dựa trên vị trí
-        processed = self._smart_character_replacement(text, char_corrections)
-        
-        # Remove invalid characters (keep only valid plate characters)
-        # Biển số VN: 0-9, A-Z (không có I, O, Q, W), dấu - và .
-        valid_chars = "0123456789ABCDEFGHJKLMNPRSTUVXYZ-."
-        processed = ''.join([c for c in processed if c in valid_chars])
-        
+        # Remove spaces/newlines + uppercase, cứu các ký tự gạch dọc/chéo
+        # hay bị đọc thành 1, rồi lọc sạch ký tự lạ (separators '-'/'.'
+        # kiểu gì cũng bị format_vietnamese_plate strip lại)
+        text = text.translate(self._strip_ws).upper()
+        text = text.translate(self._symbol_trans)
+        text = text.translate(self._strip_sep)
+        text = self._non_alnum_re.sub('', text)
+
+        # Smart replacement theo vị trí bằng 3 lượt translate C-level:
+        # vị trí 0-1 là số (mã tỉnh), vị trí 2 là chữ (loại xe), còn lại số
+        processed = (
+            text[:2].translate(self._digit_head_trans)
+            + text[2:3].translate(self._letter_trans)
+            + text[3:].translate(self._digit_tail_trans)
+        )
+
+        # Còn sót I/O/Q/W là ký tự cấm trong biển VN -> bỏ
+        processed = self._invalid_letter_re.sub('', processed)
+
         # Format Vietnamese plate
         processed = self.format_vietnamese_plate(processed)
-        
+
         return processed
     
     def _smart_character_replacement(self, text: str, corrections: dict) -> str:
         """
         Thay thế ký tự thông minh dựa trên vị trí trong biển số
-        
+        DEPRECATED: post_process_text dùng bảng translate precomputed
+
         Quy tắc biển số Việt Nam:
         - 2 ký tự đầu: Số (mã tỉnh) - VD: 29, 30, 51
         - Ký tự thứ 3: Chữ cái (loại xe) - VD: A, B, C, D, E, F, G, H, K, L
@@ -418,13 +522,109 @@ class PaddleOCRProcessor:
         Returns:
             List (text, confidence)
         """
+        if not self.available:
+            return [("", 0.0)] * len(images)
+        if not images:
+            return []
+
+        # Preprocess song song (OpenCV nhả GIL) rồi OCR mỗi crop đúng 1
+        # lượt qua _recognize_crops (crop rộng gom chung 1 call rec-only)
+        # thay vì 1-3 call/ảnh của multiple_attempts
+        from concurrent.futures import ThreadPoolExecutor
+        if len(images) > 1:
+            with ThreadPoolExecutor(max_workers=min(4, len(images))) as pool:
+                pre_imgs = list(pool.map(self.preprocess_plate_image, images))
+        else:
+            pre_imgs = [self.preprocess_plate_image(images[0])]
+
         results = []
-        for image in images:
-            text, conf = self.recognize_with_multiple_attempts(image)
+        for i, (text, conf) in enumerate(self._recognize_crops(pre_imgs)):
+            # Ảnh đọc kém mới tốn thêm attempt trên ảnh gốc
+            if conf < self.second_stop_conf:
+                text2, conf2 = self.recognize_with_multiple_attempts(images[i])
+                if conf2 > conf:
+                    text, conf = text2, conf2
             results.append((text, conf))
-        
+
         return results
 
+    @staticmethod
+    def _rec_input(image: np.ndarray) -> np.ndarray:
+        """
+        TextRecognizer/TextClassifier nội bộ transpose((2, 0, 1)) nên bắt
+        buộc input 3 kênh - crop grayscale từ preprocess convert lại BGR
+        """
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        return image
+
+    def _recognize_crops(self, images: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        OCR 1 batch crop mà không đưa list vào .ocr(): PaddleOCR 2.7.x
+        exit(0) khi det bật nhận list input (SystemExit, không bắt được
+        bằng except Exception). Crop rộng 1 tầng gom chung 1 call
+        rec-only (bỏ det), crop vuông hơn (biển 2 tầng cần det tách
+        dòng) loop .ocr() từng ảnh
+
+        Returns:
+            List (text, confidence) cùng thứ tự với input
+        """
+        results: List[Optional[Tuple[str, float]]] = [None] * len(images)
+
+        if self._text_recognizer is not None:
+            rec_idx = [i for i, img in enumerate(images)
+                       if img.shape[1] >= 2.5 * img.shape[0]]
+            if rec_idx:
+                try:
+                    imgs = [self._rec_input(images[i]) for i in rec_idx]
+                    if self.use_angle_cls and self._text_classifier is not None:
+                        imgs, _, _ = self._text_classifier(imgs)
+                    rec_res, _ = self._text_recognizer(imgs)
+                    for i, (text, conf) in zip(rec_idx, rec_res):
+                        results[i] = (self.post_process_text(text), float(conf))
+                except Exception:
+                    # API nội bộ đổi giữa các version -> đi đường ocr() chuẩn
+                    pass
+
+        for i, img in enumerate(images):
+            if results[i] is None:
+                try:
+                    page = self.ocr.ocr(img, cls=True)
+                    results[i] = self._parse_ocr_page(page[0] if page else None)
+                except Exception as e:
+                    print(f"⚠️ OCR error: {e}")
+                    results[i] = ("", 0.0)
+
+        return results
+
+    def _parse_ocr_page(self, page) -> Tuple[str, float]:
+        """
+        Parse kết quả 1 ảnh từ PaddleOCR (sort theo Y cho biển 2 tầng,
+        ghép text + post-process) - dùng chung cho batch_recognize
+        """
+        if not page:
+            return "", 0.0
+
+        text_items = []
+        for line in page:
+            if line and len(line) >= 2:
+                bbox = line[0]
+                y_pos = sum(point[1] for point in bbox) / len(bbox)
+                text_items.append({
+                    'text': line[1][0],
+                    'confidence': line[1][1],
+                    'y_pos': y_pos
+                })
+
+        if not text_items:
+            return "", 0.0
+
+        text_items.sort(key=lambda x: x['y_pos'])
+        combined_text = ' '.join(item['text'] for item in text_items)
+        avg_confidence = np.mean([item['confidence'] for item in text_items])
+
+        return self.post_process_text(combined_text), float(avg_confidence)
+
 
 def create_ocr_processor(use_gpu: bool = False, lang: str = 'en') -> Optional[PaddleOCRProcessor]:
     """
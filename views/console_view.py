@@ -3,15 +3,75 @@ Console View - MVC Architecture
 View hiển thị giao diện console/terminal
 """
 
+import sys
+import time
+from functools import lru_cache
 from typing import Dict, List, Any
 
 
+# Template bind sẵn cho show_results: 1 call format_map mỗi plate thay
+# vì parse 4 f-string spec riêng
+_PLATE_TPL = (
+    "  Plate {i}:\n"
+    "    Text: {text}\n"
+    "    Detection confidence: {det:.2f}\n"
+    "    OCR confidence: {ocr:.2f}\n"
+).format_map
+
+
+@lru_cache(maxsize=32)
+def _compile_stats_formatter(schema):
+    """
+    Compile sẵn template cho 1 schema stats (tuple (key, type)): dashboard
+    refresh cùng shape nhiều lần thì khỏi branch isinstance từng key nữa,
+    chỉ còn 1 call .format thẳng
+    """
+    lines = ["\n📈 Statistics:"]
+    for idx, (key, kind) in enumerate(schema):
+        if kind is float:
+            lines.append(f"   {key}: {{{idx}:.2f}}")
+        else:
+            lines.append(f"   {key}: {{{idx}}}")
+    lines.append("\n")
+    return "\n".join(lines).format
+
+
 class ConsoleView:
     """View cho giao diện console"""
     
     def __init__(self):
         """Khởi tạo console view"""
         self.line_width = 70
+
+        # Separator render sẵn 1 lần, menu/header vẽ đi vẽ lại khỏi nhân
+        # string mỗi call
+        self._sep = "=" * self.line_width
+
+        # Throttle progress: chỉ vẽ tối đa ~30 lần/giây, loop chặt gọi
+        # mỗi item thì đỡ hàng nghìn lượt write '\r'
+        self._last_progress_t = 0.0
+
+        # Cache string prompt đã ghép "\n{prompt}: ": menu loop hỏi đi hỏi
+        # lại cùng vài câu, khỏi format + cấp phát string mới mỗi lần
+        self._prompt_cache = {}
+
+        self._enable_ansi()
+
+    @staticmethod
+    def _enable_ansi():
+        """Bật ANSI escape trên console Windows (no-op trên Unix)"""
+        import os
+        if os.name == 'nt':
+            try:
+                import ctypes
+                kernel32 = ctypes.windll.kernel32
+                handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+                mode = ctypes.c_uint32()
+                if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+                    # ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
+                    kernel32.SetConsoleMode(handle, mode.value | 0x0004)
+            except Exception:
+                pass
     
     def show_header(self, title: str):
         """
@@ -20,9 +80,10 @@ class ConsoleView:
         Args:
             title: Tiêu đề
         """
-        print("\n" + "="*self.line_width)
-        print(title.center(self.line_width))
-        print("="*self.line_width)
+        # 1 write với separator cache sẵn thay vì 3 print + 2 lần "="*width
+        sys.stdout.write(
+            f"\n{self._sep}\n{title.center(self.line_width)}\n{self._sep}\n")
+        sys.stdout.flush()
     
     def show_menu(self, options: List[str]):
         """
@@ -31,10 +92,11 @@ class ConsoleView:
         Args:
             options: List các lựa chọn
         """
-        print()
-        for i, option in enumerate(options, 1):
-            print(f"{i}. {option}")
-        print("="*self.line_width)
+        lines = [""]
+        lines.extend(f"{i}. {option}" for i, option in enumerate(options, 1))
+        lines.append(self._sep)
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
     
     def get_input(self, prompt: str) -> str:
         """
@@ -46,7 +108,9 @@ class ConsoleView:
         Returns:
             User input
         """
-        return input(f"\n{prompt}: ").strip()
+        p = self._prompt_cache.get(prompt) or \
+            self._prompt_cache.setdefault(prompt, f"\n{prompt}: ")
+        return input(p).strip()
     
     def show_info(self, message: str):
         """
@@ -91,18 +155,24 @@ class ConsoleView:
         Args:
             results: List kết quả
         """
-        print(f"\n📊 Results: {len(results)} plate(s) detected\n")
-        
-        for idx, result in enumerate(results, 1):
-            text = result.get('plate_text', 'N/A')
-            det_conf = result.get('detection_confidence', 0.0)
-            ocr_conf = result.get('ocr_confidence', 0.0)
-            
-            print(f"  Plate {idx}:")
-            print(f"    Text: {text}")
-            print(f"    Detection confidence: {det_conf:.2f}")
-            print(f"    OCR confidence: {ocr_conf:.2f}")
-            print()
+        # Gom toàn bộ report thành 1 string và 1 lần write: mỗi print là
+        # 1 lượt write/syscall riêng, result set lớn là I/O ăn hết thời gian.
+        # Block mỗi plate đi qua _PLATE_TPL compile sẵn ở module level thay
+        # vì dựng lại 4 f-string spec mỗi vòng lặp
+        lines = [f"\n📊 Results: {len(results)} plate(s) detected\n"]
+
+        lines.extend(
+            _PLATE_TPL({
+                'i': idx,
+                'text': result.get('plate_text', 'N/A'),
+                'det': result.get('detection_confidence', 0.0),
+                'ocr': result.get('ocr_confidence', 0.0),
+            })
+            for idx, result in enumerate(results, 1)
+        )
+
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
     
     def show_statistics(self, stats: Dict):
         """
@@ -111,15 +181,18 @@ class ConsoleView:
         Args:
             stats: Dictionary thống kê
         """
-        print(f"\n📈 Statistics:")
-        for key, value in stats.items():
-            if isinstance(value, float):
-                print(f"   {key}: {value:.2f}")
-            elif isinstance(value, list):
-                print(f"   {key}: {', '.join(map(str, value))}")
-            else:
-                print(f"   {key}: {value}")
-        print()
+        # Formatter compile sẵn theo schema (memoize): cùng shape stats
+        # thì chỉ còn 1 call .format + 1 write
+        schema = tuple((key, type(value)) for key, value in stats.items())
+        fmt = _compile_stats_formatter(schema)
+
+        values = [
+            ', '.join(map(str, value)) if kind is list else value
+            for (_, kind), value in zip(schema, stats.values())
+        ]
+
+        sys.stdout.write(fmt(*values))
+        sys.stdout.flush()
     
     def show_progress(self, current: int, total: int, message: str = "Processing"):
         """
@@ -130,16 +203,27 @@ class ConsoleView:
             total: Tổng số
             message: Thông điệp
         """
+        # Gate theo thời gian: tick giữa chừng đến sớm hơn 33ms thì bỏ,
+        # tick cuối (current >= total) luôn vẽ để chốt 100%
+        now = time.monotonic()
+        if current < total and now - self._last_progress_t < 0.033:
+            return
+        self._last_progress_t = now
+
         percentage = (current / total * 100) if total > 0 else 0
-        print(f"\r{message}: {current}/{total} ({percentage:.1f}%)", end='', flush=True)
-        
+        sys.stdout.write(f"\r{message}: {current}/{total} ({percentage:.1f}%)")
+
         if current >= total:
-            print()  # New line when done
+            sys.stdout.write("\n")  # New line when done
+        sys.stdout.flush()
     
     def clear_screen(self):
         """Xóa màn hình"""
-        import os
-        os.system('cls' if os.name == 'nt' else 'clear')
+        # ANSI escape thay os.system: không fork shell (cmd.exe khởi động
+        # mất hàng trăm ms trên Windows); Windows cần bật VT processing
+        # 1 lần, làm trong _enable_ansi lúc init
+        sys.stdout.write("\x1b[2J\x1b[H")
+        sys.stdout.flush()
     
     def wait_for_key(self, message: str = "Press Enter to continue"):
         """
@@ -148,4 +232,6 @@ class ConsoleView:
         Args:
             message: Thông điệp
         """
-        input(f"\n{message}...")
+        p = self._prompt_cache.get(message) or \
+            self._prompt_cache.setdefault(message, f"\n{message}...")
+        input(p)
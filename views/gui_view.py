@@ -5,11 +5,44 @@ View hiển thị giao diện đồ họa (Tkinter)
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
-import cv2
 import os
-from pathlib import Path
+import time
 import threading
+from functools import lru_cache, partial
+
+# Extension ảnh hợp lệ cho quét folder (so sánh sau khi lower)
+_IMG_EXT = frozenset({'jpg', 'jpeg', 'png', 'bmp'})
+
+
+@lru_cache(maxsize=32)
+def _load_thumbnail(path: str, mtime: float, width: int, height: int):
+    """
+    Load + resize ảnh hiển thị, cache theo (path, mtime, size): chọn lại
+    cùng file thì khỏi tốn lượt LANCZOS resample nữa. Cache PIL Image chứ
+    không cache PhotoImage (PhotoImage gắn với Tk instance)
+    """
+    # PIL import lazy: GUI vẽ được cửa sổ đầu tiên sớm hơn, chỉ trả giá
+    # import khi thật sự hiển thị ảnh
+    from PIL import Image
+
+    image = Image.open(path)
+
+    # Ảnh camera lớn thì reduce() trước (box filter SIMD, hệ số nguyên)
+    # cho gần kích thước đích rồi mới LANCZOS bước cuối: factor=4 là
+    # LANCZOS chỉ còn xử lý 1/16 số pixel
+    factor = max(1, min(image.width // (2 * width),
+                        image.height // (2 * height)))
+    if factor > 1:
+        image = image.reduce(factor)
+
+    # Sau reduce mà chỉ còn co <= 1.5x thì BILINEAR (nhanh ~3x LANCZOS,
+    # mắt thường không phân biệt ở tỷ lệ này); co sâu mới cần LANCZOS
+    ratio = max(image.width / width, image.height / height)
+    resample = (Image.Resampling.BILINEAR if ratio <= 1.5
+                else Image.Resampling.LANCZOS)
+
+    image.thumbnail((width, height), resample)
+    return image
 
 
 class GUIView:
@@ -33,6 +66,21 @@ class GUIView:
         self.current_image_path = None
         self.results = []
         self.is_processing = False
+
+        # Throttle status update từ worker thread: mỗi after(0) là 1
+        # callback chen vào event queue của tkinter, folder lớn spam
+        # liên tục sẽ nghẹt UI thread
+        self._last_status_t = 0.0
+
+        # Kết quả per-image gom ở worker, UI drain theo chu kỳ 100ms
+        # (1 insert mỗi lượt) thay vì 1 callback after mỗi ảnh
+        self._pending = []
+        self._flush_active = False
+
+        # Ring 2 PhotoImage tái dùng qua paste(): sweep folder khỏi
+        # alloc/free bitmap uncompressed ~12MB mỗi frame hiển thị
+        self._photo_ring = [None, None]
+        self._ring_idx = 0
         
         # Setup UI
         self._setup_ui()
@@ -93,69 +141,33 @@ class GUIView:
         )
         controls_title.pack(pady=10)
         
-        # Buttons
-        btn_style = {
-            'font': ('Arial', 11),
-            'width': 25,
-            'height': 2,
-            'relief': tk.RAISED,
-            'bd': 2
-        }
-        
-        # Single image button
-        self.btn_single = tk.Button(
-            parent,
-            text="🖼️  Nhận diện ảnh đơn",
-            command=self.process_single_image,
-            bg='#3498db',
-            fg='white',
-            **btn_style
-        )
-        self.btn_single.pack(pady=5, padx=10)
-        
-        # Folder button
-        self.btn_folder = tk.Button(
-            parent,
-            text="📁 Nhận diện folder ảnh",
-            command=self.process_folder,
-            bg='#2ecc71',
-            fg='white',
-            **btn_style
-        )
-        self.btn_folder.pack(pady=5, padx=10)
-        
-        # Video button
-        self.btn_video = tk.Button(
-            parent,
-            text="🎬 Nhận diện video",
-            command=self.process_video,
-            bg='#9b59b6',
-            fg='white',
-            **btn_style
+        # Buttons - ttk.Style compile 1 lần dùng chung cho cả 5 nút,
+        # đỡ Tk parse từng đống kwarg style khi tạo widget
+        style = ttk.Style()
+        style.configure(
+            "Action.TButton",
+            font=("Arial", 11),
+            width=28,
+            padding=8
         )
-        self.btn_video.pack(pady=5, padx=10)
-        
-        # Webcam button
-        self.btn_webcam = tk.Button(
-            parent,
-            text="📸 Nhận diện webcam",
-            command=self.process_webcam,
-            bg='#e74c3c',
-            fg='white',
-            **btn_style
-        )
-        self.btn_webcam.pack(pady=5, padx=10)
-        
-        # Clear button
-        self.btn_clear = tk.Button(
-            parent,
-            text="🗑️  Xóa kết quả",
-            command=self.clear_results,
-            bg='#95a5a6',
-            fg='white',
-            **btn_style
-        )
-        self.btn_clear.pack(pady=5, padx=10)
+        style.map("Action.TButton", background=[("active", "#2980b9")])
+
+        buttons = [
+            ("🖼️  Nhận diện ảnh đơn", self.process_single_image, 'btn_single'),
+            ("📁 Nhận diện folder ảnh", self.process_folder, 'btn_folder'),
+            ("🎬 Nhận diện video", self.process_video, 'btn_video'),
+            ("📸 Nhận diện webcam", self.process_webcam, 'btn_webcam'),
+            ("🗑️  Xóa kết quả", self.clear_results, 'btn_clear'),
+        ]
+        for text, command, attr in buttons:
+            btn = ttk.Button(
+                parent,
+                text=text,
+                command=command,
+                style="Action.TButton"
+            )
+            btn.pack(pady=5, padx=10)
+            setattr(self, attr, btn)
         
         # Separator
         ttk.Separator(parent, orient='horizontal').pack(fill=tk.X, pady=20, padx=10)
@@ -255,48 +267,112 @@ class GUIView:
         self.info_text.delete(1.0, tk.END)
         self.info_text.insert(tk.END, message)
         
+    def _flush_pending(self):
+        """
+        Drain các dòng kết quả worker đã gom vào _pending: 1 insert mỗi
+        100ms thay vì N callback after(0) lắt nhắt xuyên thread boundary
+        """
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self.info_text.insert(tk.END, "".join(batch))
+            self.info_text.see(tk.END)
+
+        if self._flush_active:
+            self.root.after(100, self._flush_pending)
+
     def _update_status(self, message):
         """Cập nhật status bar"""
+        # Không ép update_idletasks: Tk tự redraw ở vòng event loop kế
+        # tiếp; force redraw đồng bộ mỗi lần đổi status vừa thừa vừa
+        # chặn các callback after() khác đang xếp hàng
         self.status_bar.config(text=message)
+
+    def _toast(self, message, ms=2500):
+        """
+        Toast tự tắt thay messagebox modal: không chặn event loop nên
+        các callback after() từ worker vẫn chạy tiếp
+        """
+        top = tk.Toplevel(self.root)
+        top.overrideredirect(True)
+        top.attributes('-topmost', True)
+
+        tk.Label(
+            top,
+            text=message,
+            font=("Arial", 11),
+            bg='#2c3e50',
+            fg='white',
+            padx=15,
+            pady=8
+        ).pack()
+
+        # Đặt góc trên phải cửa sổ chính
         self.root.update_idletasks()
-        
-    def _display_image(self, image_path):
-        """Hiển thị ảnh"""
+        x = self.root.winfo_rootx() + self.root.winfo_width() - 320
+        y = self.root.winfo_rooty() + 90
+        top.geometry(f"+{x}+{y}")
+
+        top.after(ms, top.destroy)
+
+    def _display_image(self, image_source):
+        """
+        Hiển thị ảnh: nhận đường dẫn file, numpy array BGR (frame đã
+        decode sẵn của controller - khỏi đọc + decode JPEG lại) hoặc
+        PIL Image
+        """
         try:
-            # Load image
-            image = Image.open(image_path)
-            
-            # Resize to fit display
-            display_width = 800
-            display_height = 500
-            image.thumbnail((display_width, display_height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            photo = ImageTk.PhotoImage(image)
-            
+            from PIL import Image, ImageTk
+
+            if isinstance(image_source, (str, os.PathLike)):
+                # Load + resize qua cache (key kèm mtime để file bị ghi
+                # đè vẫn hiển thị bản mới)
+                path = str(image_source)
+                mtime = os.path.getmtime(path)
+                image = _load_thumbnail(path, mtime, 800, 500)
+                self.current_image_path = path
+            elif isinstance(image_source, Image.Image):
+                image = image_source.copy()
+                image.thumbnail((800, 500), Image.Resampling.BILINEAR)
+            else:
+                # numpy array BGR của OpenCV
+                image = Image.fromarray(image_source[..., ::-1])
+                image.thumbnail((800, 500), Image.Resampling.BILINEAR)
+
+            # PhotoImage lấy từ ring 2 buffer: cùng size thì paste() đè
+            # lên buffer cũ thay vì alloc PhotoImage mới; đổi size (ảnh
+            # khác aspect) mới tạo lại. Ring 2 phần tử để buffer đang
+            # hiển thị không bị ghi đè ngay
+            photo = self._photo_ring[self._ring_idx]
+            if photo is None or (photo.width(), photo.height()) != image.size:
+                photo = ImageTk.PhotoImage(image)
+                self._photo_ring[self._ring_idx] = photo
+            else:
+                photo.paste(image)
+            self._ring_idx ^= 1
+
             # Update label
             self.image_label.config(image=photo, text="")
             self.image_label.image = photo  # Keep reference
-            
-            self.current_image_path = image_path
-            
+
         except Exception as e:
             messagebox.showerror("Error", f"Cannot display image: {str(e)}")
             
     def _display_results(self, results):
         """Hiển thị kết quả"""
         self.results_text.delete(1.0, tk.END)
-        
+
         if not results:
             self.results_text.insert(tk.END, "No plates detected.")
             return
-            
-        self.results_text.insert(tk.END, f"Found {len(results)} plate(s):\n\n")
-        
-        for i, result in enumerate(results, 1):
-            text = result.get('text', 'N/A')
-            conf = result.get('confidence', 0)
-            self.results_text.insert(tk.END, f"{i}. {text} (Confidence: {conf:.2f})\n")
+
+        # Build cả output rồi 1 lần insert: mỗi insert là 1 lượt re-layout
+        # của text widget, 50+ biển là thấy khựng
+        lines = [f"Found {len(results)} plate(s):\n\n"]
+        lines.extend(
+            f"{i}. {r.get('text', 'N/A')} (Confidence: {r.get('confidence', 0):.2f})\n"
+            for i, r in enumerate(results, 1)
+        )
+        self.results_text.insert(tk.END, "".join(lines))
             
     def process_single_image(self):
         """Xử lý ảnh đơn"""
@@ -371,36 +447,85 @@ class GUIView:
                 self.is_processing = True
                 
                 if self.controller:
-                    # Get image files
-                    image_files = []
-                    for ext in ['*.jpg', '*.jpeg', '*.png', '*.bmp']:
-                        image_files.extend(Path(folder_path).glob(ext))
-                        
+                    # Get image files - 1 lượt scandir thay 4 lượt glob
+                    # (mỗi glob re-stat cả folder; case-insensitive luôn)
+                    with os.scandir(folder_path) as it:
+                        image_files = sorted(
+                            e.path for e in it
+                            if e.is_file()
+                            and e.name.rpartition('.')[2].lower() in _IMG_EXT
+                        )
+
+
                     total = len(image_files)
                     all_results = []
-                    
-                    for i, img_path in enumerate(image_files, 1):
-                        self.root.after(0, lambda i=i, t=total: self._update_status(f"Processing {i}/{t}..."))
-                        
+
+                    # Producer thread preload + resize thumbnail ảnh kế
+                    # tiếp (warm cache _load_thumbnail) chồng lên thời
+                    # gian inference; queue bounded để giữ trần memory
+                    from queue import Queue
+                    preload_q = Queue(maxsize=2)
+
+                    def preload():
+                        for p in image_files:
+                            try:
+                                _load_thumbnail(p, os.path.getmtime(p),
+                                                800, 500)
+                            except Exception:
+                                pass
+                            preload_q.put(p)
+
+                    threading.Thread(target=preload, daemon=True).start()
+
+                    # Bật vòng drain định kỳ: kết quả từng ảnh hiện dần
+                    # trong info_text, gom 100ms/lượt insert
+                    self._pending = [
+                        f"Folder: {os.path.basename(folder_path)}\n",
+                        f"Total images: {total}\n\nResults:\n"
+                    ]
+                    self._flush_active = True
+                    self.root.after(0, lambda: self.info_text.delete(1.0, tk.END))
+                    self.root.after(100, self._flush_pending)
+
+                    for i in range(1, total + 1):
+                        img_path = preload_q.get()
+
+                        # Schedule status + preview tối đa 1 lần/50ms (ảnh
+                        # cuối luôn báo) - khỏi flood event queue bằng after(0)
+                        now = time.monotonic()
+                        if i >= total or now - self._last_status_t >= 0.05:
+                            self._last_status_t = now
+                            # partial với string format sẵn ở worker thay
+                            # lambda: không alloc closure mỗi vòng, UI
+                            # thread khỏi format f-string
+                            msg = f"Processing {i}/{total}..."
+                            self.root.after(0, partial(self._update_status, msg))
+                            # Thumbnail đã nằm sẵn trong cache nên hiển
+                            # thị gần như miễn phí
+                            self.root.after(0, partial(self._display_image, img_path))
+
                         results = self.controller.process_image(str(img_path))
+                        plates = [r.get('text', 'N/A') for r in results]
                         all_results.append({
                             'file': os.path.basename(img_path),
                             'count': len(results),
-                            'plates': [r.get('text', 'N/A') for r in results]
+                            'plates': plates
                         })
-                        
-                    # Show summary
-                    info = f"Folder: {os.path.basename(folder_path)}\n"
-                    info += f"Total images: {total}\n\n"
-                    info += "Results:\n"
-                    for r in all_results:
-                        info += f"- {r['file']}: {r['count']} plate(s)\n"
-                        for plate in r['plates']:
-                            info += f"  → {plate}\n"
-                            
-                    self.root.after(0, lambda: self._show_info(info))
+
+                        # Gom dòng kết quả ở worker (list.append atomic
+                        # dưới GIL), _flush_pending drain về widget
+                        entry = [f"- {os.path.basename(img_path)}: "
+                                 f"{len(results)} plate(s)\n"]
+                        entry.extend(f"  → {p}\n" for p in plates)
+                        self._pending.append("".join(entry))
+
+                    # Tắt vòng drain, flush nốt phần còn đọng
+                    self._flush_active = False
+                    self.root.after(0, self._flush_pending)
                     self.root.after(0, lambda: self._update_status(f"✅ Processed {total} images"))
-                    self.root.after(0, lambda: messagebox.showinfo("Complete", f"Processed {total} images"))
+                    # Toast không modal: messagebox chặn event loop tới
+                    # khi user bấm OK, treo luôn các update đang xếp hàng
+                    self.root.after(0, lambda: self._toast(f"✅ Processed {total} images"))
                 else:
                     self.root.after(0, lambda: messagebox.showerror("Error", "Controller not initialized"))
                     
@@ -408,10 +533,11 @@ class GUIView:
                 self.root.after(0, lambda: messagebox.showerror("Error", f"Processing failed: {str(e)}"))
                 self.root.after(0, lambda: self._update_status("❌ Error"))
             finally:
+                self._flush_active = False
                 self.is_processing = False
-                
+
         threading.Thread(target=process, daemon=True).start()
-        
+
     def process_video(self):
         """Xử lý video"""
         messagebox.showinfo("Video Processing", "Video processing will be implemented with VideoController")